@@ -1,6 +1,35 @@
+import argparse
+import codecs
+import io
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
 import requests
+from array import array
+from bisect import bisect_left
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache, wraps
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from plexapi.server import PlexServer
 from difflib import SequenceMatcher
+from urllib.parse import urlencode, urlparse
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+try:
+    import numpy as np
+except ImportError:  # Optional: vectorizes catalog diffs
+    np = None
 
 VERSION = 1.1
 
@@ -16,53 +45,459 @@ RADARR_API_KEY = "YOUR_RADARR_API_KEY"
 SONARR_URL = "http://localhost:8989/api/v3"
 SONARR_API_KEY = "YOUR_SONARR_API_KEY"
 
+# Several Plex libraries and Radarr/Sonarr instances (e.g. 1080p and 4K). Each library and each instance
+# is fetched in parallel as its own shard; each pairing compares the union of its Plex sections with the
+# union of its instances. Leave both empty to compare "Movies" with RADARR_URL and "TV Shows" with SONARR_URL.
+ARR_INSTANCES = {
+    # "radarr": {"type": "radarr", "url": "http://localhost:7878/api/v3", "api_key": "KEY", "concurrency": 8},
+    # "radarr-4k": {"type": "radarr", "url": "http://localhost:7879/api/v3", "api_key": "KEY", "concurrency": 4},
+    # "sonarr": {"type": "sonarr", "url": "http://localhost:8989/api/v3", "api_key": "KEY"},
+}
+PAIRINGS = [
+    # {"name": "Movies", "sections": ["Movies"], "instances": ["radarr"]},
+    # {"name": "Movies 4K", "sections": ["Movies 4K"], "instances": ["radarr-4k"]},
+    # {"name": "TV Shows", "sections": ["TV Shows", "Anime"], "instances": ["sonarr"]},
+]
+
+# Number of items requested per Plex library page
+PLEX_PAGE_SIZE = 500
+
+# Persistent cache for Radarr/Sonarr ID lookups (set ID_CACHE_PATH to None to disable)
+ID_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pvac_cache.sqlite")
+ID_CACHE_TTL_DAYS = 30           # How long resolved IDs are kept
+ID_CACHE_NEGATIVE_TTL_DAYS = 3   # How long IDs that did not resolve are kept
+ID_CACHE_MAX_ENTRIES = 100000    # Oldest entries are evicted beyond this size
+
+# Radarr/Sonarr HTTP settings
+LOOKUP_CONCURRENCY = 8           # Parallel fallback lookups per instance (unless set per instance)
+REQUEST_TIMEOUT = 30             # Seconds before a single request is abandoned
+REQUEST_RETRIES = 3              # Retries for connection errors and 429/5xx responses
+REQUEST_BACKOFF = 0.5            # Backoff factor between retries (0.5s, 1s, 2s, ...)
+
+# Title matching for items whose IDs differ between Plex and the ARRs
+TITLE_MATCH_THRESHOLD = 0.85     # Minimum similarity ratio (0-1) for two titles to match
+TITLE_MATCH_WORKERS = 0          # Processes used to score large sets (0 = one per CPU, 1 = no pool)
+TITLE_MATCH_PARALLEL_MIN = 2000  # Unmatched Plex titles needed before the process pool is used
+
+# Incremental mode (--incremental): state of the last run, reused to only re-read what changed
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pvac_snapshot.json")
+SNAPSHOT_SAFETY_MARGIN = 3600    # Seconds subtracted from the last run time to absorb clock skew
+
+# Profiling (--profile / --prometheus): per-phase timings and per-endpoint HTTP statistics
+PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pvac_profile.json")
+PROMETHEUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pvac.prom")
+PROFILE_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# -----------------------------
+# PROFILING
+# -----------------------------
+class Profiler:
+    """Wall/CPU time per phase and request counts and latency histograms per endpoint for one run"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.phases = {}
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def record_phase(self, name: str, wall: float, cpu: float, items: int | None):
+        with self._lock:
+            phase = self.phases.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0, "items": 0})
+            phase["calls"] += 1
+            phase["wall"] += wall
+            phase["cpu"] += cpu
+            if items is not None:
+                phase["items"] += items
+            phase["rss_mb"] = peak_rss_mb()
+
+    def record_response(self, resp, *args, **kwargs):
+        """requests response hook; the latency is the time until the response headers arrived"""
+        # Fold numeric path segments so e.g. every /library/metadata/<key> lands in one bucket
+        path = "/".join("{id}" if part.isdigit() else part for part in urlparse(resp.url).path.split("/"))
+        endpoint = f"{resp.request.method} {path}"
+        latency = resp.elapsed.total_seconds()
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {"count": 0, "errors": 0, "seconds": 0.0,
+                                                    "buckets": [0] * len(PROFILE_LATENCY_BUCKETS)}
+            stats["count"] += 1
+            stats["seconds"] += latency
+            if resp.status_code >= 400:
+                stats["errors"] += 1
+            for i, bound in enumerate(PROFILE_LATENCY_BUCKETS):
+                if latency <= bound:
+                    stats["buckets"][i] += 1
+                    break
+
+    def report(self) -> dict:
+        """The run as a JSON-serializable dict"""
+        with self._lock:
+            phases = {}
+            for name, phase in self.phases.items():
+                phases[name] = dict(phase, wall=round(phase["wall"], 6), cpu=round(phase["cpu"], 6),
+                                    items_per_second=round(phase["items"] / phase["wall"], 1) if phase["wall"] else None)
+            endpoints = {}
+            for endpoint, stats in self.endpoints.items():
+                cumulative, buckets = 0, {}
+                for bound, count in zip(PROFILE_LATENCY_BUCKETS, stats["buckets"]):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                buckets["+Inf"] = stats["count"]
+                endpoints[endpoint] = {"count": stats["count"], "errors": stats["errors"],
+                                       "seconds": round(stats["seconds"], 6), "buckets": buckets}
+        return {
+            "version": VERSION,
+            "started": self.started,
+            "duration": round(time.time() - self.started, 6),
+            "peak_rss_mb": peak_rss_mb(),
+            "phases": phases,
+            "http": endpoints,
+        }
+
+    def write_json(self, path: str):
+        _write_atomic(path, json.dumps(self.report(), indent=2))
+
+    def write_prometheus(self, path: str):
+        """Write the run in the Prometheus text format, for node_exporter's textfile collector"""
+        report = self.report()
+        lines = [
+            "# HELP pvac_run_duration_seconds Wall time of the last PVAC run.",
+            "# TYPE pvac_run_duration_seconds gauge",
+            f"pvac_run_duration_seconds {report['duration']}",
+            "# HELP pvac_last_run_timestamp_seconds Start time of the last PVAC run.",
+            "# TYPE pvac_last_run_timestamp_seconds gauge",
+            f"pvac_last_run_timestamp_seconds {report['started']}",
+        ]
+        if report["peak_rss_mb"] is not None:
+            lines += ["# HELP pvac_peak_rss_bytes Peak resident memory of the last PVAC run.",
+                      "# TYPE pvac_peak_rss_bytes gauge",
+                      f"pvac_peak_rss_bytes {int(report['peak_rss_mb'] * 1024 * 1024)}"]
+        for metric, key, help_text in (
+                ("pvac_phase_wall_seconds", "wall", "Wall time spent in a phase (nested phases are included)."),
+                ("pvac_phase_cpu_seconds", "cpu", "CPU time of the thread running a phase."),
+                ("pvac_phase_calls", "calls", "Times a phase ran."),
+                ("pvac_phase_items", "items", "Items processed by a phase.")):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+            lines += [f'{metric}{{phase="{name}"}} {phase[key]}' for name, phase in report["phases"].items()]
+        lines += ["# HELP pvac_http_request_duration_seconds Time until response headers, per endpoint.",
+                  "# TYPE pvac_http_request_duration_seconds histogram"]
+        errors = ["# HELP pvac_http_errors Responses with a 4xx/5xx status, per endpoint.",
+                  "# TYPE pvac_http_errors gauge"]
+        for endpoint, stats in report["http"].items():
+            label = endpoint.replace("\\", "\\\\").replace('"', '\\"')
+            lines += [f'pvac_http_request_duration_seconds_bucket{{endpoint="{label}",le="{le}"}} {count}'
+                      for le, count in stats["buckets"].items()]
+            lines += [f'pvac_http_request_duration_seconds_sum{{endpoint="{label}"}} {stats["seconds"]}',
+                      f'pvac_http_request_duration_seconds_count{{endpoint="{label}"}} {stats["count"]}']
+            errors.append(f'pvac_http_errors{{endpoint="{label}"}} {stats["errors"]}')
+        lines += errors
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+def _write_atomic(path: str, text: str):
+    """Write a file via a temporary file so readers never see a partial one"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+# Set by main() when profiling is requested; None keeps instrumentation to a single check per call
+PROFILER = None
+
+def profiled(name: str, count=None):
+    """Record calls of the decorated function as phase `name`; count(result, args) gives the items processed"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = PROFILER
+            if profiler is None:
+                return fn(*args, **kwargs)
+            wall, cpu = time.perf_counter(), time.thread_time()
+            result = fn(*args, **kwargs)
+            profiler.record_phase(name, time.perf_counter() - wall, time.thread_time() - cpu,
+                                  count(result, args) if count else None)
+            return result
+        return wrapper
+    return decorate
+
+def _profile_response(resp, *args, **kwargs):
+    profiler = PROFILER
+    if profiler is not None:
+        profiler.record_response(resp)
+
 # -----------------------------
 # UTILITY FUNCTIONS
 # -----------------------------
-def lookup_tmdb_from_imdb(imdb_id: str) -> int | None:
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(base_url: str, pool_size: int | None = None) -> requests.Session:
+    """Return the shared keep-alive session for Plex or an *arr instance, with retries and backoff"""
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            retry = Retry(
+                total=REQUEST_RETRIES,
+                backoff_factor=REQUEST_BACKOFF,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or LOOKUP_CONCURRENCY,
+                                  max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.hooks["response"].append(_profile_response)
+            _sessions[base_url] = session
+        return session
+
+def arr_instance(kind: str, instance: dict | None = None) -> dict:
+    """The given instance, or the single Radarr/Sonarr instance configured by RADARR_*/SONARR_*"""
+    if instance is not None:
+        return instance
+    if kind == "radarr":
+        return {"name": "radarr", "type": "radarr", "url": RADARR_URL, "api_key": RADARR_API_KEY,
+                "concurrency": LOOKUP_CONCURRENCY}
+    return {"name": "sonarr", "type": "sonarr", "url": SONARR_URL, "api_key": SONARR_API_KEY,
+            "concurrency": LOOKUP_CONCURRENCY}
+
+def instance_session(instance: dict) -> requests.Session:
+    return get_session(instance["url"], instance["concurrency"])
+
+# Statuses meaning the *arr knows no match for an ID; anything else but 200 is an error and is never cached
+NO_MATCH_STATUSES = (404,)
+
+def lookup_tmdb_from_imdb(imdb_id: str, instance: dict | None = None) -> int | None:
     """Convert IMDb ID to TMDb via Radarr API"""
-    url = f"{RADARR_URL}/movie/lookup/imdb"
-    resp = requests.get(url, params={"apikey": RADARR_API_KEY, "imdbId": imdb_id})
-    if resp.status_code == 200:
-        data = resp.json()
-        if isinstance(data, dict) and data.get("tmdbId"):
-            return int(data["tmdbId"])
+    instance = arr_instance("radarr", instance)
+    url = f"{instance['url']}/movie/lookup/imdb"
+    resp = instance_session(instance).get(url, params={"apikey": instance["api_key"], "imdbId": imdb_id},
+                                          timeout=REQUEST_TIMEOUT)
+    if resp.status_code in NO_MATCH_STATUSES:
+        return None
+    resp.raise_for_status()
+    data = resp.json()
+    if isinstance(data, dict) and data.get("tmdbId"):
+        return int(data["tmdbId"])
     return None
 
-def lookup_tmdb_from_tvdb(tvdb_id: str) -> int | None:
+def lookup_tmdb_from_tvdb(tvdb_id: str, instance: dict | None = None) -> int | None:
     """Convert TVDb ID to TMDb via Radarr API"""
-    url = f"{RADARR_URL}/movie/lookup/tvdb"
-    resp = requests.get(url, params={"apikey": RADARR_API_KEY, "tvdbId": tvdb_id})
-    if resp.status_code == 200:
-        data = resp.json()
-        if isinstance(data, dict) and data.get("tmdbId"):
-            return int(data["tmdbId"])
+    instance = arr_instance("radarr", instance)
+    url = f"{instance['url']}/movie/lookup/tvdb"
+    resp = instance_session(instance).get(url, params={"apikey": instance["api_key"], "tvdbId": tvdb_id},
+                                          timeout=REQUEST_TIMEOUT)
+    if resp.status_code in NO_MATCH_STATUSES:
+        return None
+    resp.raise_for_status()
+    data = resp.json()
+    if isinstance(data, dict) and data.get("tmdbId"):
+        return int(data["tmdbId"])
     return None
 
-def lookup_tvdb_from_imdb_tv(imdb_id: str) -> int | None:
+def lookup_tvdb_from_imdb_tv(imdb_id: str, instance: dict | None = None) -> int | None:
     """Convert IMDb ID to TVDb via Sonarr API"""
-    url = f"{SONARR_URL}/series/lookup"
-    resp = requests.get(url, params={"apikey": SONARR_API_KEY, "term": f"imdb:{imdb_id}"})
-    if resp.status_code == 200:
-        data = resp.json()
-        if isinstance(data, list) and len(data) > 0 and data[0].get("tvdbId"):
-            return int(data[0]["tvdbId"])
+    instance = arr_instance("sonarr", instance)
+    url = f"{instance['url']}/series/lookup"
+    resp = instance_session(instance).get(url, params={"apikey": instance["api_key"], "term": f"imdb:{imdb_id}"},
+                                          timeout=REQUEST_TIMEOUT)
+    if resp.status_code in NO_MATCH_STATUSES:
+        return None
+    resp.raise_for_status()
+    data = resp.json()
+    if isinstance(data, list) and len(data) > 0 and data[0].get("tvdbId"):
+        return int(data[0]["tvdbId"])
     return None
 
+class IDCache:
+    """Persistent SQLite cache for ID lookups with TTLs, negative caching and size-bounded eviction.
+
+    The database is opened on first use and reopened after close(), so importing PVAC (the service, the
+    benchmark, title-match worker processes) creates no file and main() can run more than once.
+    """
+
+    def __init__(self, path: str | None, ttl_days: float = ID_CACHE_TTL_DAYS,
+                 negative_ttl_days: float = ID_CACHE_NEGATIVE_TTL_DAYS,
+                 max_entries: int = ID_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_days * 86400
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memo = {}  # (kind, key) -> (value, expires), so a long-running process honours the TTLs too
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        """The open database, or None without a path; callers hold _lock"""
+        if self._conn is None and self.path:
+            # Shared across threads by the resident service; every access goes through _lock
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS id_cache ("
+                " kind TEXT NOT NULL, key TEXT NOT NULL, value INTEGER,"
+                " expires REAL NOT NULL, updated REAL NOT NULL,"
+                " PRIMARY KEY (kind, key))"
+            )
+        return self._conn
+
+    def get(self, kind: str, key: str):
+        """Return (found, value) for a cached lookup, counting hits and misses"""
+        found, value = self.peek(kind, key)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found, value
+
+    def peek(self, kind: str, key: str):
+        """Return (found, value) for a cached lookup without counting it, e.g. to reuse an earlier resolution"""
+        with self._lock:
+            now = time.time()
+            memo = self._memo.get((kind, key))
+            if memo is not None:
+                if memo[1] > now:
+                    return True, memo[0]
+                del self._memo[(kind, key)]
+            conn = self._connection()
+            if conn is not None:
+                row = conn.execute(
+                    "SELECT value, expires FROM id_cache WHERE kind = ? AND key = ?", (kind, key)
+                ).fetchone()
+                if row and row[1] > now:
+                    self._memo[(kind, key)] = (row[0], row[1])
+                    return True, row[0]
+            return False, None
+
+    def set(self, kind: str, key: str, value: int | None):
+        """Store a lookup result, using the shorter TTL when the ID did not resolve"""
+        with self._lock:
+            now = time.time()
+            expires = now + (self.ttl if value is not None else self.negative_ttl)
+            self._memo[(kind, key)] = (value, expires)
+            conn = self._connection()
+            if conn is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO id_cache (kind, key, value, expires, updated) VALUES (?, ?, ?, ?, ?)",
+                    (kind, key, value, expires, now)
+                )
+
+    def lookup(self, kind: str, key: str, resolver):
+        """Return a cached value or resolve and cache it"""
+        found, value = self.get(kind, key)
+        if not found:
+            value = resolver(key)
+            self.set(kind, key, value)
+        return value
+
+    def flush(self):
+        """Drop expired entries, evict the oldest beyond max_entries and commit"""
+        with self._lock:
+            now = time.time()
+            for memo_key in [memo_key for memo_key, (_, expires) in self._memo.items() if expires <= now]:
+                del self._memo[memo_key]
+            if self._conn is None:
+                return
+            self._conn.execute("DELETE FROM id_cache WHERE expires <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM id_cache WHERE rowid IN ("
+                " SELECT rowid FROM id_cache ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def close(self):
+        """Flush and close the database"""
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+ID_CACHE = IDCache(ID_CACHE_PATH)
+
+LOOKUP_RESOLVERS = {
+    "imdb_to_tmdb": lookup_tmdb_from_imdb,
+    "tvdb_to_tmdb": lookup_tmdb_from_tvdb,
+    "imdb_to_tvdb": lookup_tvdb_from_imdb_tv,
+}
+
+# How fallback lookups were answered in this run: from the *arr catalog indexes or by a remote lookup that
+# found an ID; "failed" counts remote lookups that errored. main() resets them
+LOOKUP_STATS = {"local": 0, "remote": 0, "failed": 0}
+_lookup_stats_lock = threading.Lock()
+
+@profiled("id_lookups", lambda result, args: len(result))
+def resolve_lookups(lookups, local_index: dict | None = None, concurrency: int | None = None,
+                    instance: dict | None = None) -> dict:
+    """Resolve (kind, key) lookups via the local *arr index, then the ID cache, then a bounded thread pool.
+
+    Remote lookups go to `instance` (default: RADARR_*/SONARR_*), at most `concurrency` (default: the
+    instance's limit) at a time.
+    """
+    results = {}
+    misses = []
+    local_hits = 0
+    for kind, key in dict.fromkeys(lookups):
+        local_value = (local_index or {}).get(kind, {}).get(key)
+        if local_value:
+            local_hits += 1
+            results[(kind, key)] = local_value
+            continue
+        found, value = ID_CACHE.get(kind, key)
+        if found:
+            results[(kind, key)] = value
+        else:
+            misses.append((kind, key))
+
+    # Pairings resolve in parallel, so the shared counters are updated under a lock
+    with _lookup_stats_lock:
+        LOOKUP_STATS["local"] += local_hits
+
+    if misses:
+        if concurrency is None:
+            concurrency = instance["concurrency"] if instance else LOOKUP_CONCURRENCY
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {pool.submit(LOOKUP_RESOLVERS[kind], key, instance): (kind, key) for kind, key in misses}
+            found = failed = 0
+            for future in as_completed(futures):
+                kind, key = futures[future]
+                try:
+                    value = future.result()
+                except (requests.RequestException, ValueError):
+                    # Outages and auth errors leave the ID unresolved for this run only, so they aren't cached
+                    failed += 1
+                    results[(kind, key)] = None
+                    continue
+                ID_CACHE.set(kind, key, value)
+                results[(kind, key)] = value
+                found += value is not None
+        with _lookup_stats_lock:
+            LOOKUP_STATS["remote"] += found
+            LOOKUP_STATS["failed"] += failed
+    return results
+
+_PUNCTUATION_RE = re.compile(r'[:\-\(\)&]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_COUNTRY_RE = re.compile(r'\s+(us|uk|au|ca)$')
+
+@lru_cache(maxsize=None)
 def normalize_title(title: str) -> str:
     """Normalize title for comparison by removing common variations"""
-    import re
     # Convert to lowercase
     title = title.lower()
     # Remove common punctuation and extra spaces
-    title = re.sub(r'[:\-\(\)&]', '', title)
-    title = re.sub(r'\s+', ' ', title)
+    title = _PUNCTUATION_RE.sub('', title)
+    title = _WHITESPACE_RE.sub(' ', title)
     title = title.strip()
     # Remove common country indicators
-    title = re.sub(r'\s+(us|uk|au|ca)$', '', title)
+    title = _COUNTRY_RE.sub('', title)
     return title
 
-def titles_similar(title1: str, title2: str, threshold: float = 0.85) -> bool:
+def titles_similar(title1: str, title2: str, threshold: float = TITLE_MATCH_THRESHOLD) -> bool:
     """Check if two titles are similar using normalized comparison"""
     norm1 = normalize_title(title1)
     norm2 = normalize_title(title2)
@@ -74,223 +509,982 @@ def titles_similar(title1: str, title2: str, threshold: float = 0.85) -> bool:
     # Then check similarity ratio
     return SequenceMatcher(None, norm1, norm2).ratio() >= threshold
 
-def find_name_matches(plex_dict, external_dict, threshold: float = 0.85):
-    """Find potential matches based on title similarity"""
+def title_grams(norm: str, n: int) -> set:
+    """Return the character n-grams of a normalized title, numbered per occurrence so set overlap counts repeats"""
+    seen = {}
+    grams = set()
+    for i in range(len(norm) - n + 1):
+        gram = norm[i:i + n]
+        seen[gram] = seen.get(gram, 0) + 1
+        grams.add(f"{gram}{seen[gram]}")
+    return grams
+
+def min_shared_grams(length: int, other_length: int, threshold: float, n: int) -> int:
+    """Lower bound on the n-grams two different titles share when their ratio reaches threshold"""
+    total = length + other_length
+    min_matched = math.ceil(threshold * total / 2 - 1e-9)
+    # M matched chars in k blocks share at least M - (n-1)*k n-grams, and k - 1 <= total - 2*M
+    return (2 * n - 1) * min_matched - (n - 1) * (total + 1)
+
+def build_title_index(external_dict, with_grams: bool = True):
+    """Index normalized titles by exact value and, if with_grams, by bigram/trigram for candidate generation"""
+    index = {"ids": [], "norms": [], "exact": {}, "grams": {2: [], 3: []} if with_grams else None,
+             "postings": {2: {}, 3: {}}, "matchers": {}}
+    for pos, (ext_id, ext_title) in enumerate(external_dict.items()):
+        norm = normalize_title(ext_title)
+        index["ids"].append(ext_id)
+        index["norms"].append(norm)
+        index["exact"].setdefault(norm, pos)
+        if not with_grams:
+            continue
+        for n in (2, 3):
+            grams = title_grams(norm, n)
+            index["grams"][n].append(grams)
+            postings = index["postings"][n]
+            for gram in grams:
+                postings.setdefault(gram, []).append(pos)
+    return index
+
+def title_candidates(norm: str, index: dict, threshold: float):
+    """Return (positions, n, grams) of indexed titles that can reach threshold against norm"""
+    norms = index["norms"]
+    if threshold <= 0.8 or index["grams"] is None:
+        # At or below 0.8 two short titles can match without sharing a bigram; score everything
+        return range(len(norms)), None, None
+
+    # Only titles in this length range can reach threshold, since ratio <= 2*min(a, b)/(a + b)
+    lengths = range(math.ceil(len(norm) * threshold / (2 - threshold) - 1e-9),
+                    math.floor(len(norm) * (2 - threshold) / threshold + 1e-9) + 1)
+    # Prefer trigrams (more selective) when their bound still guarantees an overlap
+    n = 3
+    required = min((min_shared_grams(len(norm), other, threshold, 3) for other in lengths), default=0)
+    if required < 1:
+        n = 2
+        # Above 0.8 two different titles always share at least one bigram
+        required = max(1, min((min_shared_grams(len(norm), other, threshold, 2) for other in lengths), default=1))
+    grams = title_grams(norm, n)
+    if required > len(grams):
+        return (), n, grams
+
+    # A candidate sharing >= required of these grams must contain one of the
+    # (len - required + 1) rarest of them
+    postings = index["postings"][n]
+    prefix = sorted(grams, key=lambda gram: len(postings.get(gram, ())))
+    candidates = set()
+    for gram in prefix[:len(grams) - required + 1]:
+        candidates.update(postings.get(gram, ()))
+    return sorted(candidates), n, grams
+
+def best_title_match(plex_title: str, index: dict, threshold: float):
+    """Return (position, score) of the best indexed title for plex_title, or None below threshold"""
+    norm = normalize_title(plex_title)
+
+    # Exact match after normalization scores 1.0; the earliest one wins ties
+    if norm in index["exact"]:
+        return index["exact"][norm], 1.0
+
+    norms = index["norms"]
+    matchers = index["matchers"]
+    candidates, n, grams = title_candidates(norm, index, threshold)
+    best = None
+    best_score = 0.0
+    for pos in candidates:
+        other = norms[pos]
+        # Cheap upper bounds first: length, shared grams, then quick_ratio
+        if 2 * min(len(norm), len(other)) < threshold * (len(norm) + len(other)) - 1e-9:
+            continue
+        if n and len(grams & index["grams"][n][pos]) < min_shared_grams(len(norm), len(other), threshold, n):
+            continue
+        # SequenceMatcher caches its analysis of the second sequence, so keep one per indexed title
+        matcher = matchers.get(pos)
+        if matcher is None:
+            matcher = matchers[pos] = SequenceMatcher(None, "", other)
+        matcher.set_seq1(norm)
+        if matcher.quick_ratio() < threshold:
+            continue
+        score = matcher.ratio()
+        if score >= threshold and score > best_score:
+            best = pos
+            best_score = score
+    return (best, best_score) if best is not None else None
+
+_worker_title_index = None
+
+def _init_title_worker(external_dict, threshold: float):
+    """Build the title index once per worker process"""
+    global _worker_title_index
+    _worker_title_index = (build_title_index(external_dict), threshold)
+
+def _score_title_chunk(chunk):
+    """Score a chunk of (plex_id, plex_title) pairs in a worker process"""
+    index, threshold = _worker_title_index
+    return [(plex_id, best_title_match(plex_title, index, threshold)) for plex_id, plex_title in chunk]
+
+@profiled("title_match", lambda result, args: len(args[0]))
+def find_name_matches(plex_dict, external_dict, threshold: float = TITLE_MATCH_THRESHOLD):
+    """Find the best-scoring title match for each Plex title as {plex_id: (ext_id, score)}"""
     matches = {}
+    if not plex_dict or not external_dict:
+        return matches
+    ext_ids = list(external_dict)
+    items = list(plex_dict.items())
+
+    workers = TITLE_MATCH_WORKERS or os.cpu_count() or 1
+    if workers > 1 and len(items) >= TITLE_MATCH_PARALLEL_MIN:
+        # Spread scoring over a process pool; map() keeps results in Plex order
+        chunk_size = max(1, math.ceil(len(items) / (workers * 4)))
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_title_worker,
+                                 initargs=(external_dict, threshold)) as pool:
+            results = [result for chunk in pool.map(_score_title_chunk, chunks) for result in chunk]
+    else:
+        # Below ~16 titles scoring every external title is cheaper than building the n-gram index
+        index = build_title_index(external_dict, with_grams=len(items) >= 16)
+        results = [(plex_id, best_title_match(plex_title, index, threshold)) for plex_id, plex_title in items]
+
+    for plex_id, best in results:
+        if best is not None:
+            matches[plex_id] = (ext_ids[best[0]], best[1])
+    return matches
+
+def find_name_matches_incremental(plex_dict, external_dict, previous: dict | None = None,
+                                  threshold: float = TITLE_MATCH_THRESHOLD):
+    """Same result as find_name_matches, reusing a previous run's matches where the inputs did not change"""
+    if not previous or previous.get("threshold") != threshold:
+        return find_name_matches(plex_dict, external_dict, threshold)
+    prev_plex = previous["plex"]
+    prev_external = previous["external"]
+    prev_matches = previous["matches"]
+
+    # External titles that are new or renamed since the previous run
+    new_external = {ext_id: title for ext_id, title in external_dict.items() if prev_external.get(ext_id) != title}
+
+    reusable = {}
+    rescore = {}
     for plex_id, plex_title in plex_dict.items():
-        for ext_id, ext_title in external_dict.items():
-            if titles_similar(plex_title, ext_title, threshold):
-                matches[plex_id] = ext_id
-                break
+        prev = prev_matches.get(plex_id)
+        unchanged = plex_id in prev_plex and prev_plex[plex_id] == plex_title
+        # The previous best is still the best among unchanged titles only if it is itself unchanged
+        if unchanged and (prev is None or (prev[0] in external_dict and prev[0] not in new_external)):
+            reusable[plex_id] = plex_title
+        else:
+            rescore[plex_id] = plex_title
+
+    rescored = find_name_matches(rescore, external_dict, threshold)
+    challengers = find_name_matches(reusable, new_external, threshold)
+    order = {ext_id: pos for pos, ext_id in enumerate(external_dict)}
+
+    matches = {}
+    for plex_id in plex_dict:
+        if plex_id in rescore:
+            best = rescored.get(plex_id)
+        else:
+            best = prev_matches.get(plex_id)
+            challenger = challengers.get(plex_id)
+            # Same tie-break as find_name_matches: higher score, then earlier external title
+            if challenger and (best is None or challenger[1] > best[1]
+                               or (challenger[1] == best[1] and order[challenger[0]] < order[best[0]])):
+                best = challenger
+        if best is not None:
+            matches[plex_id] = tuple(best)
     return matches
 
 # -----------------------------
 # PLEX DATA FETCHING
 # -----------------------------
-def fetch_plex_movies():
-    print("\n🎬 Fetching Plex movies...")
-    plex = PlexServer(PLEX_URL, PLEX_TOKEN)
-    plex_movies = plex.library.section("Movies")
+class PlexItem:
+    """Lightweight record of the Plex fields used by PVAC; media holds one (file, size, resolution, codec) per version"""
+    __slots__ = ("rating_key", "title", "year", "guids", "genres", "media")
+
+    def __init__(self, rating_key, title, year, guids, genres, media=()):
+        self.rating_key = rating_key
+        self.title = title
+        self.year = year
+        self.guids = guids
+        self.genres = genres
+        self.media = media
+
+def plex_item_from_element(elem) -> PlexItem:
+    """Build a PlexItem from a raw Video/Directory element of a Plex XML response"""
+    year = elem.attrib.get("year")
+    media = []
+    # Movie listings carry every media version with its parts; a multi-part version counts as one file
+    for version in elem.findall("Media"):
+        parts = version.findall("Part")
+        media.append((
+            parts[0].attrib.get("file") if parts else None,
+            sum(int(part.attrib.get("size") or 0) for part in parts),
+            version.attrib.get("videoResolution"),
+            version.attrib.get("videoCodec"),
+        ))
+    return PlexItem(
+        elem.attrib.get("ratingKey"),
+        elem.attrib.get("title", ""),
+        int(year) if year else None,
+        [guid.attrib["id"] for guid in elem.findall("Guid") if guid.attrib.get("id")],
+        [genre.attrib["tag"] for genre in elem.findall("Genre") if genre.attrib.get("tag")],
+        tuple(media),
+    )
+
+def iter_section_elements(plex, section, page_size: int | None = None, updated_since: int | None = None,
+                          params: dict | None = None):
+    """Yield the raw Video/Directory element of every item in a section, one page of page_size items at a time"""
+    page_size = page_size or PLEX_PAGE_SIZE
+    start = 0
+    while True:
+        query = urlencode({
+            "includeGuids": 1,
+            **(params or {}),
+            "X-Plex-Container-Start": start,
+            "X-Plex-Container-Size": page_size,
+        })
+        if updated_since is not None:
+            # Plex filter syntax for "updated at or after"; updatedAt also moves when an item is added
+            query += f"&updatedAt>>={int(updated_since)}"
+        data = plex.query(f"/library/sections/{section.key}/all?{query}")
+        page = [elem for elem in data if elem.tag in ("Video", "Directory")]
+        yield from page
+        start += len(page)
+        total_size = int(data.attrib.get("totalSize", start))
+        if not page or start >= total_size:
+            break
+
+def iter_section_items(plex, section, page_size: int | None = None, updated_since: int | None = None):
+    """Yield a PlexItem for every item in a section, fetching one page of page_size items at a time"""
+    for elem in iter_section_elements(plex, section, page_size, updated_since):
+        yield plex_item_from_element(elem)
+
+def section_total_size(plex, section) -> int:
+    """Return the number of items in a section without fetching any of them"""
+    data = plex.query(f"/library/sections/{section.key}/all?X-Plex-Container-Start=0&X-Plex-Container-Size=0")
+    return int(data.attrib.get("totalSize", data.attrib.get("size", 0)))
+
+def scan_section_entries(plex, section, make_entry, previous: dict | None = None, since: int | None = None):
+    """Scan a section into {rating_key: entry}; with a previous scan, only items updated since then are read.
+
+    Returns (entries, changed) where changed is None when a full scan was done.
+    """
+    if previous is not None and since is not None:
+        entries = dict(previous)
+        changed = 0
+        for item in iter_section_items(plex, section, updated_since=since):
+            entries[item.rating_key] = make_entry(item)
+            changed += 1
+        # Removed items don't show up as updates; if anything was removed, rescan the section
+        if len(entries) == section_total_size(plex, section):
+            return entries, changed
+    return {item.rating_key: make_entry(item) for item in iter_section_items(plex, section)}, None
+
+def ordered_entries(entries: dict) -> list:
+    """Entries in rating key order, so full and incremental runs resolve duplicates identically"""
+    return [entries[key] for key in sorted(entries, key=int)]
+
+def movie_entry(movie) -> tuple:
+    """Reduce a Plex movie to (title, tmdb_id, imdb_id, tvdb_id, year, media)"""
+    tmdb_id = None
+    imdb_id = None
+    tvdb_id = None
+
+    for guid in movie.guids:
+        if guid.startswith("tmdb://"):
+            tmdb_id = int(guid.split("tmdb://")[1])
+            break
+        elif guid.startswith("imdb://"):
+            imdb_id = guid.split("imdb://")[1]
+        elif guid.startswith("tvdb://"):
+            tvdb_id = guid.split("tvdb://")[1]
+
+    return (movie.title, tmdb_id, imdb_id, tvdb_id, movie.year, movie.media)
+
+@profiled("plex_movie_scan", lambda result, args: len(result))
+def scan_plex_movies(plex, out=None, previous: dict | None = None, since: int | None = None,
+                     section: str = "Movies"):
+    """Scan a Plex movie section into {rating_key: (title, tmdb_id, imdb_id, tvdb_id, year, media)}"""
+    print("\n🎬 Fetching Plex movies..." if section == "Movies" else f"\n🎬 Fetching Plex movies ({section})...",
+          file=out)
+    plex_movies = plex.library.section(section)
+    entries, changed = scan_section_entries(plex, plex_movies, movie_entry, previous, since)
+    if changed is not None:
+        print(f"♻️ {changed} movies added or updated since the last run", file=out)
+    return entries
+
+def resolve_movie_entries(entries: dict, radarr_index: dict | None = None, instance: dict | None = None):
+    """Resolve scanned movie entries to TMDb IDs, returning the same tuple as fetch_plex_movies"""
+    entries = ordered_entries(entries)
 
     plex_tmdb_ids = set()
     plex_movie_id_to_title = {}
     movies_without_usable_ids = []
-    total_plex_movies = 0
+    total_plex_movies = len(entries)
     duplicate_movies = {}
 
-    for movie in plex_movies.all():
-        total_plex_movies += 1
-        movie.reload()
-
-        tmdb_id = None
-        imdb_id = None
-        tvdb_id = None
-
-        for guid in movie.guids:
-            if guid.id.startswith("tmdb://"):
-                tmdb_id = int(guid.id.split("tmdb://")[1])
-                break
-            elif guid.id.startswith("imdb://"):
-                imdb_id = guid.id.split("imdb://")[1]
-            elif guid.id.startswith("tvdb://"):
-                tvdb_id = guid.id.split("tvdb://")[1]
+    # Fallback lookups if no TMDb ID: IMDb first, then TVDb for whatever is still unresolved
+    resolved = resolve_lookups(
+        (("imdb_to_tmdb", imdb_id) for _, tmdb_id, imdb_id, *_ in entries if not tmdb_id and imdb_id),
+        radarr_index, instance=instance
+    )
+    resolved.update(resolve_lookups(
+        (("tvdb_to_tmdb", tvdb_id) for _, tmdb_id, imdb_id, tvdb_id, *_ in entries
+         if not tmdb_id and tvdb_id and not resolved.get(("imdb_to_tmdb", imdb_id))),
+        radarr_index, instance=instance
+    ))
 
-        # Fallback lookups if no TMDb ID
+    for movie_title, tmdb_id, imdb_id, tvdb_id, *_ in entries:
         if not tmdb_id and imdb_id:
-            tmdb_id = lookup_tmdb_from_imdb(imdb_id)
+            tmdb_id = resolved[("imdb_to_tmdb", imdb_id)]
         if not tmdb_id and tvdb_id:
-            tmdb_id = lookup_tmdb_from_tvdb(tvdb_id)
+            tmdb_id = resolved[("tvdb_to_tmdb", tvdb_id)]
 
         if tmdb_id:
             # Check for duplicates
             if tmdb_id in plex_movie_id_to_title:
                 if tmdb_id not in duplicate_movies:
                     duplicate_movies[tmdb_id] = [plex_movie_id_to_title[tmdb_id]]
-                duplicate_movies[tmdb_id].append(movie.title)
+                duplicate_movies[tmdb_id].append(movie_title)
             else:
                 plex_tmdb_ids.add(tmdb_id)
-                plex_movie_id_to_title[tmdb_id] = movie.title
+                plex_movie_id_to_title[tmdb_id] = movie_title
         else:
-            movies_without_usable_ids.append(movie.title)
-#            print(f"[DEBUG] No usable ID for Plex movie: {movie.title}")
-#            print("        GUIDs:", [g.id for g in movie.guids])
+            movies_without_usable_ids.append(movie_title)
+#            print(f"[DEBUG] No usable ID for Plex movie: {movie_title}")
+
+    return plex_tmdb_ids, plex_movie_id_to_title, total_plex_movies, movies_without_usable_ids, duplicate_movies
+
+@profiled("plex_movie_resolve", lambda result, args: result[2])
+def fetch_plex_movies(plex, radarr_index: dict | None = None, entries=None, out=None, instance: dict | None = None):
+    if entries is None:
+        entries = scan_plex_movies(plex, out)
+    plex_tmdb_ids, plex_movie_id_to_title, total_plex_movies, movies_without_usable_ids, duplicate_movies = \
+        resolve_movie_entries(entries, radarr_index, instance)
 
     # Print summary of movies without usable IDs
     if movies_without_usable_ids:
-        print(f"\n📋 Movies in Plex without usable IDs ({len(movies_without_usable_ids)}):")
+        print(f"\n📋 Movies in Plex without usable IDs ({len(movies_without_usable_ids)}):", file=out)
         for movie_title in sorted(movies_without_usable_ids):
-            print(f" - {movie_title}")
+            print(f" - {movie_title}", file=out)
     
     # Print duplicate movies
     if duplicate_movies:
         total_duplicate_entries = sum(len(titles) for titles in duplicate_movies.values())
         total_unique_duplicates = len(duplicate_movies)
-        print(f"\n🔄 Duplicate movies ({total_unique_duplicates} unique IDs with {total_duplicate_entries} total entries):")
+        print(f"\n🔄 Duplicate movies ({total_unique_duplicates} unique IDs with {total_duplicate_entries} total entries):", file=out)
         for tmdb_id, titles in duplicate_movies.items():
-            print(f" - TMDb ID {tmdb_id}:")
+            print(f" - TMDb ID {tmdb_id}:", file=out)
             for title in titles:
-                print(f"   • {title}")
+                print(f"   • {title}", file=out)
+
+    print_duplicate_files(find_duplicate_files(entries, movie_tmdb_by_key(entries, radarr_index)), "TMDb", out)
     
     return plex_tmdb_ids, plex_movie_id_to_title, total_plex_movies, movies_without_usable_ids, duplicate_movies
 
-def fetch_plex_tv_shows():
-    print("\n📺 Fetching Plex TV shows...")
-    plex = PlexServer(PLEX_URL, PLEX_TOKEN)
-    plex_shows = plex.library.section("TV Shows")
+def show_entry(show) -> tuple:
+    """Reduce a Plex TV show to (title, tvdb_id, imdb_id)"""
+    tvdb_id = None
+    imdb_id = None
+
+    for guid in show.guids:
+        if guid.startswith("tvdb://"):
+            tvdb_id = int(guid.split("tvdb://")[1])
+            break
+        elif guid.startswith("imdb://"):
+            imdb_id = guid.split("imdb://")[1]
+
+    return (show.title, tvdb_id, imdb_id)
+
+@profiled("plex_show_scan", lambda result, args: len(result))
+def scan_plex_tv_shows(plex, out=None, previous: dict | None = None, since: int | None = None,
+                       section: str = "TV Shows"):
+    """Scan a Plex TV show section into {rating_key: (title, tvdb_id, imdb_id)}"""
+    print("\n📺 Fetching Plex TV shows..." if section == "TV Shows" else f"\n📺 Fetching Plex TV shows ({section})...",
+          file=out)
+    plex_shows = plex.library.section(section)
+    entries, changed = scan_section_entries(plex, plex_shows, show_entry, previous, since)
+    if changed is not None:
+        print(f"♻️ {changed} TV shows added or updated since the last run", file=out)
+    return entries
+
+def resolve_show_entries(entries: dict, sonarr_index: dict | None = None, instance: dict | None = None):
+    """Resolve scanned TV show entries to TVDb IDs, returning the same tuple as fetch_plex_tv_shows"""
+    entries = ordered_entries(entries)
 
     plex_tvdb_ids = set()
     plex_show_id_to_title = {}
     shows_without_usable_ids = []
-    total_plex_shows = 0
+    total_plex_shows = len(entries)
     duplicate_shows = {}
 
-    for show in plex_shows.all():
-        total_plex_shows += 1
-        show.reload()
-
-        tvdb_id = None
-        imdb_id = None
-
-        for guid in show.guids:
-            if guid.id.startswith("tvdb://"):
-                tvdb_id = int(guid.id.split("tvdb://")[1])
-                break
-            elif guid.id.startswith("imdb://"):
-                imdb_id = guid.id.split("imdb://")[1]
+    # Fallback lookup if no TVDb ID
+    resolved = resolve_lookups(
+        (("imdb_to_tvdb", imdb_id) for _, tvdb_id, imdb_id in entries if not tvdb_id and imdb_id),
+        sonarr_index, instance=instance
+    )
 
-        # Fallback lookup if no TVDb ID
+    for show_title, tvdb_id, imdb_id in entries:
         if not tvdb_id and imdb_id:
-            tvdb_id = lookup_tvdb_from_imdb_tv(imdb_id)
+            tvdb_id = resolved[("imdb_to_tvdb", imdb_id)]
 
         if tvdb_id:
             # Check for duplicates
             if tvdb_id in plex_show_id_to_title:
                 if tvdb_id not in duplicate_shows:
                     duplicate_shows[tvdb_id] = [plex_show_id_to_title[tvdb_id]]
-                duplicate_shows[tvdb_id].append(show.title)
+                duplicate_shows[tvdb_id].append(show_title)
             else:
                 plex_tvdb_ids.add(tvdb_id)
-                plex_show_id_to_title[tvdb_id] = show.title
+                plex_show_id_to_title[tvdb_id] = show_title
         else:
-            shows_without_usable_ids.append(show.title)
-#            print(f"[DEBUG] No usable ID for Plex TV show: {show.title}")
-#            print("        GUIDs:", [g.id for g in show.guids])
+            shows_without_usable_ids.append(show_title)
+#            print(f"[DEBUG] No usable ID for Plex TV show: {show_title}")
+
+    return plex_tvdb_ids, plex_show_id_to_title, total_plex_shows, shows_without_usable_ids, duplicate_shows
+
+@profiled("plex_show_resolve", lambda result, args: result[2])
+def fetch_plex_tv_shows(plex, sonarr_index: dict | None = None, entries=None, out=None,
+                        instance: dict | None = None):
+    if entries is None:
+        entries = scan_plex_tv_shows(plex, out)
+    plex_tvdb_ids, plex_show_id_to_title, total_plex_shows, shows_without_usable_ids, duplicate_shows = \
+        resolve_show_entries(entries, sonarr_index, instance)
 
     # Print summary of shows without usable IDs
     if shows_without_usable_ids:
-        print(f"\n📋 TV Shows in Plex without usable IDs ({len(shows_without_usable_ids)}):")
+        print(f"\n📋 TV Shows in Plex without usable IDs ({len(shows_without_usable_ids)}):", file=out)
         for show_title in sorted(shows_without_usable_ids):
-            print(f" - {show_title}")
+            print(f" - {show_title}", file=out)
     
     # Print duplicate shows
     if duplicate_shows:
         total_duplicate_entries = sum(len(titles) for titles in duplicate_shows.values())
         total_unique_duplicates = len(duplicate_shows)
-        print(f"\n🔄 Duplicate TV shows ({total_unique_duplicates} unique IDs with {total_duplicate_entries} total entries):")
+        print(f"\n🔄 Duplicate TV shows ({total_unique_duplicates} unique IDs with {total_duplicate_entries} total entries):", file=out)
         for tvdb_id, titles in duplicate_shows.items():
-            print(f" - TVDb ID {tvdb_id}:")
+            print(f" - TVDb ID {tvdb_id}:", file=out)
             for title in titles:
-                print(f"   • {title}")
+                print(f"   • {title}", file=out)
     
     return plex_tvdb_ids, plex_show_id_to_title, total_plex_shows, shows_without_usable_ids, duplicate_shows
 
+@profiled("plex_episode_scan", lambda result, args: len(result))
+def scan_plex_episodes(plex, section: str = "TV Shows", out=None) -> list:
+    """Scan every episode of a Plex TV show section into [(show_rating_key, season, episode)]"""
+    print("\n📼 Fetching Plex episodes..." if section == "TV Shows" else f"\n📼 Fetching Plex episodes ({section})...",
+          file=out)
+    plex_shows = plex.library.section(section)
+    episodes = []
+    # type=4 lists the section's leaves (episodes) directly, so no per-show requests are needed
+    for elem in iter_section_elements(plex, plex_shows, params={"type": 4, "includeGuids": 0}):
+        season = elem.attrib.get("parentIndex")
+        episode = elem.attrib.get("index")
+        if season is not None and episode is not None:
+            episodes.append((elem.attrib.get("grandparentRatingKey"), int(season), int(episode)))
+    return episodes
+
+def show_tvdb_by_key(entries: dict, sonarr_index: dict | None = None) -> dict:
+    """Map Plex show rating keys to TVDb IDs, after resolve_show_entries has resolved the fallbacks"""
+    imdb_to_tvdb = (sonarr_index or {}).get("imdb_to_tvdb", {})
+    tvdb_by_key = {}
+    for key, (_, tvdb_id, imdb_id) in entries.items():
+        if not tvdb_id and imdb_id:
+            tvdb_id = imdb_to_tvdb.get(imdb_id) or ID_CACHE.peek("imdb_to_tvdb", imdb_id)[1]
+        if tvdb_id:
+            tvdb_by_key[key] = tvdb_id
+    return tvdb_by_key
+
+# -----------------------------
+# DUPLICATE FILES
+# -----------------------------
+RESOLUTION_RANK = {"sd": 480, "480": 480, "576": 576, "720": 720, "1080": 1080, "4k": 2160, "2160": 2160}
+
+def movie_tmdb_by_key(entries: dict, radarr_index: dict | None = None) -> dict:
+    """Map Plex movie rating keys to TMDb IDs, after resolve_movie_entries has resolved the fallbacks"""
+    index = radarr_index or {}
+    tmdb_by_key = {}
+    for key, (_, tmdb_id, imdb_id, tvdb_id, *_) in entries.items():
+        if not tmdb_id and imdb_id:
+            tmdb_id = index.get("imdb_to_tmdb", {}).get(imdb_id) or ID_CACHE.peek("imdb_to_tmdb", imdb_id)[1]
+        if not tmdb_id and tvdb_id:
+            tmdb_id = index.get("tvdb_to_tmdb", {}).get(tvdb_id) or ID_CACHE.peek("tvdb_to_tmdb", tvdb_id)[1]
+        if tmdb_id:
+            tmdb_by_key[key] = tmdb_id
+    return tmdb_by_key
+
+def duplicate_group(kind: str, key, copies: list) -> tuple:
+    """Order copies best first (highest resolution, then largest file); everything after the first is reclaimable"""
+    copies.sort(key=lambda copy: (RESOLUTION_RANK.get(str(copy[4]).lower(), 0), copy[3] or 0), reverse=True)
+    return kind, key, copies, sum(copy[3] or 0 for copy in copies[1:])
+
+@profiled("duplicate_files", lambda result, args: len(result))
+def find_duplicate_files(entries: dict, id_by_key: dict) -> list:
+    """Group the media versions of scanned entries by resolved ID and by normalized title+year.
+
+    Items sharing either one end up in the same group, so every file is counted once. Returns
+    [(kind, key, copies, reclaimable_bytes)] for groups holding more than one file, where kind is "id" when
+    every item in the group has the same ID and "title" otherwise, and copies are
+    (title, year, file, size, resolution, codec), best first.
+    """
+    parent = {}
+
+    def root(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    first_by_link = {}
+    for key in sorted(entries, key=int):
+        entry = entries[key]
+        if not entry[5]:
+            continue
+        parent[key] = key
+        id = id_by_key.get(key)
+        links = [("title", normalize_title(entry[0]), entry[4])] + ([("id", id)] if id is not None else [])
+        for link in links:
+            other = first_by_link.setdefault(link, key)
+            parent[root(key)] = root(other)
+
+    members = {}
+    for key in parent:
+        members.setdefault(root(key), []).append(key)
+
+    groups = []
+    for keys in members.values():
+        copies = [(entries[key][0], entries[key][4], *version) for key in keys for version in entries[key][5]]
+        if len(copies) < 2:
+            continue
+        ids = {id_by_key.get(key) for key in keys}
+        if len(ids) == 1 and None not in ids:
+            groups.append(duplicate_group("id", ids.pop(), copies))
+        else:
+            title, year = entries[keys[0]][0], entries[keys[0]][4]
+            groups.append(duplicate_group("title", (title, year), copies))
+    return groups
+
+def format_size(size: int) -> str:
+    return f"{size / 1024**3:.1f} GB" if size >= 1024**3 else f"{size / 1024**2:.0f} MB"
+
+def print_duplicate_files(groups: list, id_name: str, out=None):
+    """Print duplicate file groups, largest reclaimable first"""
+    if not groups:
+        return
+    reclaimable = sum(group[3] for group in groups)
+    print(f"\n🗂️ Duplicate files ({len(groups)} groups, {format_size(reclaimable)} reclaimable):", file=out)
+    for kind, key, copies, group_reclaimable in sorted(groups, key=lambda group: -group[3]):
+        if kind == "id":
+            label = f"{id_name} ID {key}"
+        else:
+            label = f"Same title: {key[0]} ({key[1]})" if key[1] else f"Same title: {key[0]}"
+        print(f" - {label} [{format_size(group_reclaimable)} reclaimable]", file=out)
+        for i, (title, year, file, size, resolution, codec) in enumerate(copies):
+            print(f"   {'keep ' if i == 0 else 'extra'} {resolution or '?'} {codec or '?'} {format_size(size or 0)} "
+                  f"{file or title}", file=out)
+
 # -----------------------------
 # ARR DATA FETCHING
 # -----------------------------
-def fetch_radarr_movies():
-    print("\n🎞️ Fetching Radarr movies...")
-    radarr_resp = requests.get(
-        f"{RADARR_URL}/movie",
-        params={"apikey": RADARR_API_KEY}
-    )
-    radarr_resp.raise_for_status()
-    radarr_movies = radarr_resp.json()
+class ArrItem:
+    """Compact record of the Radarr/Sonarr catalog fields used by PVAC"""
+    __slots__ = ("tmdb_id", "tvdb_id", "imdb_id", "title", "has_file", "arr_id")
+
+    def __init__(self, tmdb_id, tvdb_id, imdb_id, title, has_file, arr_id=None):
+        self.arr_id = arr_id
+        self.tmdb_id = tmdb_id
+        self.tvdb_id = tvdb_id
+        self.imdb_id = imdb_id
+        self.title = title
+        self.has_file = has_file
+
+def iter_json_array(resp, chunk_size: int = 65536):
+    """Incrementally decode the elements of a streamed top-level JSON array, one at a time"""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = resp.iter_content(chunk_size=chunk_size)
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buffer = buffer[pos:] + text_decoder.decode(b"", final=True)
+        else:
+            buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if buffer[pos:pos + 1] != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    first = True
+
+    while True:
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise ValueError("Unterminated JSON array")
+        if buffer[pos] == "]":
+            return
+        if not first:
+            if buffer[pos] != ",":
+                raise ValueError("Invalid or truncated JSON array")
+            pos += 1
+            skip_whitespace()
+        # Element may be split across chunks, and a split number still decodes ("1." + "5" as 1), so an
+        # element only counts once the "," or "]" after it has arrived; otherwise read more and retry
+        while True:
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = None
+            if eof:
+                break
+            after = end
+            while after is not None and after < len(buffer) and buffer[after] in " \t\r\n":
+                after += 1
+            if after is not None and after < len(buffer) and buffer[after] in ",]":
+                break
+            fill()
+        if end is None:
+            raise ValueError("Invalid or truncated JSON array")
+        pos = end
+        first = False
+        yield element
+
+def radarr_item(m: dict) -> ArrItem:
+    """Reduce a Radarr movie resource to an ArrItem"""
+    return ArrItem(m.get("tmdbId"), m.get("tvdbId"), m.get("imdbId"), m.get("title"), bool(m.get("hasFile")),
+                   m.get("id"))
+
+def sonarr_item(show: dict) -> ArrItem:
+    """Reduce a Sonarr series resource to an ArrItem"""
+    # Check if the show has downloaded episodes
+    has_episodes = (show.get("statistics") or {}).get("episodeFileCount", 0) > 0
+    return ArrItem(show.get("tmdbId"), show.get("tvdbId"), show.get("imdbId"), show.get("title"), has_episodes,
+                   show.get("id"))
 
+def iter_radarr_movies(resp):
+    """Yield compact ArrItem records from a streamed Radarr /movie response"""
+    for m in iter_json_array(resp):
+        yield radarr_item(m)
+
+def iter_sonarr_series(resp):
+    """Yield compact ArrItem records from a streamed Sonarr /series response"""
+    for show in iter_json_array(resp):
+        yield sonarr_item(show)
+
+def build_radarr_maps(movies):
+    """Build (downloaded tmdb_ids, id_to_title, cross-reference index) from Radarr ArrItems"""
     radarr_tmdb_ids = set()
     radarr_movie_id_to_title = {}
+    # Cross-reference index over the whole catalog, used to resolve Plex items without a TMDb GUID
+    radarr_index = {"imdb_to_tmdb": {}, "tvdb_to_tmdb": {}}
 
-    for m in radarr_movies:
-        if m.get("hasFile") and m.get("tmdbId"):
-            tmdb_id = int(m["tmdbId"])
+    for m in movies:
+        if m.tmdb_id:
+            if m.imdb_id:
+                radarr_index["imdb_to_tmdb"][m.imdb_id] = int(m.tmdb_id)
+            if m.tvdb_id:
+                radarr_index["tvdb_to_tmdb"][str(m.tvdb_id)] = int(m.tmdb_id)
+        if m.has_file and m.tmdb_id:
+            tmdb_id = int(m.tmdb_id)
             radarr_tmdb_ids.add(tmdb_id)
-            radarr_movie_id_to_title[tmdb_id] = m["title"]
+            radarr_movie_id_to_title[tmdb_id] = m.title
 
-    return radarr_tmdb_ids, radarr_movie_id_to_title
-
-def fetch_sonarr_tv_shows():
-    print("\n📡 Fetching Sonarr TV shows...")
-    sonarr_resp = requests.get(
-        f"{SONARR_URL}/series",
-        params={"apikey": SONARR_API_KEY}
-    )
-    sonarr_resp.raise_for_status()
-    sonarr_shows = sonarr_resp.json()
+    return radarr_tmdb_ids, radarr_movie_id_to_title, radarr_index
 
+def build_sonarr_maps(shows):
+    """Build (downloaded tvdb_ids, id_to_title, cross-reference index) from Sonarr ArrItems"""
     sonarr_tvdb_ids = set()
     sonarr_show_id_to_title = {}
+    # Cross-reference index over the whole catalog, used to resolve Plex items without a TVDb GUID;
+    # tvdb_to_series gives the Sonarr series ID for episode lookups
+    sonarr_index = {"imdb_to_tvdb": {}, "tvdb_to_series": {}}
 
-    for show in sonarr_shows:
-        # Check if the show has downloaded episodes
-        has_episodes = show.get("statistics", {}).get("episodeFileCount", 0) > 0
-        
-        if has_episodes and show.get("tvdbId"):
-            tvdb_id = int(show["tvdbId"])
+    for show in shows:
+        if show.tvdb_id and show.imdb_id:
+            sonarr_index["imdb_to_tvdb"][show.imdb_id] = int(show.tvdb_id)
+        if show.tvdb_id and show.arr_id is not None:
+            sonarr_index["tvdb_to_series"][int(show.tvdb_id)] = show.arr_id
+
+        if show.has_file and show.tvdb_id:
+            tvdb_id = int(show.tvdb_id)
             sonarr_tvdb_ids.add(tvdb_id)
-            sonarr_show_id_to_title[tvdb_id] = show["title"]
+            sonarr_show_id_to_title[tvdb_id] = show.title
+
+    return sonarr_tvdb_ids, sonarr_show_id_to_title, sonarr_index
+
+def peak_rss_mb() -> float | None:
+    """Peak resident memory of this process in MB, or None where it can't be measured"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+@profiled("radarr_fetch", lambda result, args: len(result[0]))
+def fetch_radarr_movies(out=None, instance: dict | None = None):
+    print("\n🎞️ Fetching Radarr movies..." if instance is None else
+          f"\n🎞️ Fetching Radarr movies ({instance['name']})...", file=out)
+    instance = arr_instance("radarr", instance)
 
-    return sonarr_tvdb_ids, sonarr_show_id_to_title
+    # Stream the catalog so only the fields we need are ever held in memory
+    with instance_session(instance).get(
+        f"{instance['url']}/movie",
+        params={"apikey": instance["api_key"]},
+        timeout=REQUEST_TIMEOUT,
+        stream=True
+    ) as radarr_resp:
+        radarr_resp.raise_for_status()
+        return build_radarr_maps(iter_radarr_movies(radarr_resp))
+
+@profiled("sonarr_fetch", lambda result, args: len(result[0]))
+def fetch_sonarr_tv_shows(out=None, instance: dict | None = None):
+    print("\n📡 Fetching Sonarr TV shows..." if instance is None else
+          f"\n📡 Fetching Sonarr TV shows ({instance['name']})...", file=out)
+    instance = arr_instance("sonarr", instance)
+
+    # Stream the catalog so only the fields we need are ever held in memory
+    with instance_session(instance).get(
+        f"{instance['url']}/series",
+        params={"apikey": instance["api_key"]},
+        timeout=REQUEST_TIMEOUT,
+        stream=True
+    ) as sonarr_resp:
+        sonarr_resp.raise_for_status()
+        return build_sonarr_maps(iter_sonarr_series(sonarr_resp))
+
+def iter_sonarr_episodes(resp):
+    """Yield (season, episode, has_file) from a streamed Sonarr /episode response"""
+    for episode in iter_json_array(resp):
+        yield episode.get("seasonNumber"), episode.get("episodeNumber"), bool(episode.get("hasFile"))
+
+def fetch_series_episodes(series_id: int, instance: dict) -> list:
+    with instance_session(instance).get(
+        f"{instance['url']}/episode",
+        params={"apikey": instance["api_key"], "seriesId": series_id},
+        timeout=REQUEST_TIMEOUT,
+        stream=True
+    ) as resp:
+        resp.raise_for_status()
+        return list(iter_sonarr_episodes(resp))
+
+@profiled("sonarr_episode_fetch", lambda result, args: sum(len(episodes) for episodes in result[0].values()))
+def fetch_sonarr_episodes(series_ids, instance: dict | None = None, out=None) -> tuple:
+    """Fetch ({series_id: [(season, episode, has_file)]}, [failed series_id]), one request per series within the
+    instance's concurrency"""
+    print("\n📼 Fetching Sonarr episodes..." if instance is None else
+          f"\n📼 Fetching Sonarr episodes ({instance['name']})...", file=out)
+    instance = arr_instance("sonarr", instance)
+    episodes = {}
+    failed = []
+    series_ids = list(dict.fromkeys(series_ids))
+    if not series_ids:
+        return episodes, failed
+    with ThreadPoolExecutor(max_workers=max(1, min(instance["concurrency"], len(series_ids)))) as pool:
+        futures = {pool.submit(fetch_series_episodes, series_id, instance): series_id for series_id in series_ids}
+        for future in as_completed(futures):
+            series_id = futures[future]
+            try:
+                episodes[series_id] = future.result()
+            except (requests.RequestException, ValueError) as e:
+                # One series failing (after retries) only drops that series from the episode comparison
+                failed.append(series_id)
+                print(f"⚠️ Could not fetch episodes of Sonarr series {series_id}: {e}", file=out)
+    return episodes, sorted(failed)
+
+# -----------------------------
+# COMPACT CATALOGS
+# -----------------------------
+# Row flags of a Catalog
+DUPLICATE = 1  # the ID is held by more than one Plex item
+
+class Catalog:
+    """Columnar {id: title} catalog: a sorted int64 ID array, one offset-indexed title string and a flags column.
+
+    Rows without a usable ID get negative placeholder IDs so they sort first and never join with real IDs.
+    Iterating, len() and `in` cover ID rows only, so a Catalog stands in for both the ID set and the
+    id_to_title dict it replaces.
+    """
+    __slots__ = ("ids", "offsets", "text", "flags", "first_id_row")
+
+    def __init__(self, ids: array, offsets: array, text: str, flags: bytearray):
+        self.ids = ids
+        self.offsets = offsets
+        self.text = text
+        self.flags = flags
+        self.first_id_row = bisect_left(ids, 0)
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.first_id_row
+
+    def __iter__(self):
+        return iter(self.ids[self.first_id_row:])
+
+    def row(self, id: int) -> int:
+        """Row of an ID, or -1 if it isn't in the catalog"""
+        i = bisect_left(self.ids, id, self.first_id_row)
+        return i if i < len(self.ids) and self.ids[i] == id else -1
+
+    def __contains__(self, id) -> bool:
+        return isinstance(id, int) and id >= 0 and self.row(id) >= 0
+
+    def title_at(self, row: int) -> str:
+        return self.text[self.offsets[row]:self.offsets[row + 1]]
+
+    def __getitem__(self, id: int) -> str:
+        row = self.row(id) if isinstance(id, int) and id >= 0 else -1
+        if row < 0:
+            raise KeyError(id)
+        return self.title_at(row)
+
+    def get(self, id: int, default=None):
+        try:
+            return self[id]
+        except KeyError:
+            return default
+
+    def items(self):
+        return ((self.ids[row], self.title_at(row)) for row in range(self.first_id_row, len(self.ids)))
+
+    def without_ids(self) -> list:
+        """Titles of the rows without a usable ID"""
+        return [self.title_at(row) for row in range(self.first_id_row)]
+
+    def flagged(self, flag: int) -> list:
+        """IDs of the ID rows with the given flag set"""
+        return [self.ids[row] for row in range(self.first_id_row, len(self.ids)) if self.flags[row] & flag]
+
+    def difference(self, other: "Catalog") -> list:
+        """IDs in this catalog but not in the other, in ID order"""
+        return sorted_difference(self.ids, self.first_id_row, other.ids, other.first_id_row)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns"""
+        return (sys.getsizeof(self.ids) + sys.getsizeof(self.offsets) + sys.getsizeof(self.text)
+                + sys.getsizeof(self.flags))
+
+def build_catalog(id_to_title: dict, without_usable_ids=(), duplicates: dict | None = None) -> Catalog:
+    """Pack an {id: title} map, plus titles without usable IDs and duplicate IDs, into a Catalog"""
+    duplicates = duplicates or {}
+    rows = [(i - len(without_usable_ids), title, 0) for i, title in enumerate(without_usable_ids)]
+    rows += sorted((id, title, DUPLICATE if id in duplicates else 0) for id, title in id_to_title.items())
+    ids = array("q", (id for id, _, _ in rows))
+    offsets = array("q", [0])
+    position = 0
+    for _, title, _ in rows:
+        position += len(title)
+        offsets.append(position)
+    return Catalog(ids, offsets, "".join(title for _, title, _ in rows), bytearray(flag for _, _, flag in rows))
+
+def sorted_difference(a: array, a_start: int, b: array, b_start: int) -> list:
+    """Values of the sorted, unique array a[a_start:] missing from b[b_start:], vectorized with NumPy if available"""
+    if np is not None:
+        a_values = np.frombuffer(a, dtype=np.int64)[a_start:]
+        b_values = np.frombuffer(b, dtype=np.int64)[b_start:]
+        if not len(b_values):
+            return a_values.tolist()
+        # Both columns are sorted, so one binary search per value finds where it would sit in b
+        positions = np.searchsorted(b_values, a_values).clip(max=len(b_values) - 1)
+        return a_values[b_values[positions] != a_values].tolist()
+    # Merge walk over both sorted columns
+    missing = []
+    j, b_end = b_start, len(b)
+    for i in range(a_start, len(a)):
+        value = a[i]
+        while j < b_end and b[j] < value:
+            j += 1
+        if j == b_end or b[j] != value:
+            missing.append(value)
+    return missing
 
 # -----------------------------
 # COMPARISON FUNCTIONS
 # -----------------------------
-def compare_movies(plex_tmdb_ids, plex_movie_id_to_title, radarr_tmdb_ids, radarr_movie_id_to_title, movies_without_usable_ids):
-    print("\n" + "="*50)
-    print("🎬 MOVIE COMPARISON")
-    print("="*50)
+def reconcile(plex_ids, plex_id_to_title, ext_ids, ext_id_to_title, without_usable_ids, match_cache: dict | None = None):
+    """Diff Plex against an ARR by ID, then pair leftovers by title.
 
-    plex_movies_not_in_radarr = plex_tmdb_ids - radarr_tmdb_ids
-    radarr_movies_not_in_plex = radarr_tmdb_ids - plex_tmdb_ids
+    The IDs and titles are sets and dicts, or Catalogs, which diff on their sorted ID columns; only the
+    unmatched IDs are ever taken out of a Catalog. Returns (plex_only_ids, ext_only_ids, name_matches), the
+    ID lists in ID order, where name_matches maps a Plex ID, or "NO_ID:<title>" for Plex items without a
+    usable ID, to (ext_id, score).
+    """
+    # Sorted by ID so ties between equally good title matches resolve the same way on every run
+    if isinstance(plex_ids, Catalog) and isinstance(ext_ids, Catalog):
+        plex_not_in_ext = plex_ids.difference(ext_ids)
+        ext_not_in_plex = ext_ids.difference(plex_ids)
+    else:
+        plex_not_in_ext = sorted(plex_ids - ext_ids)
+        ext_not_in_plex = sorted(ext_ids - plex_ids)
+    return match_leftovers(plex_not_in_ext, ext_not_in_plex, plex_id_to_title, ext_id_to_title, without_usable_ids,
+                           match_cache)
 
-    # Find potential name matches for movies with IDs
-    plex_unmatched_movies = {id: plex_movie_id_to_title[id] for id in plex_movies_not_in_radarr}
-    radarr_unmatched_movies = {id: radarr_movie_id_to_title[id] for id in radarr_movies_not_in_plex}
-    movie_name_matches = find_name_matches(plex_unmatched_movies, radarr_unmatched_movies)
+def match_leftovers(plex_not_in_ext, ext_not_in_plex, plex_id_to_title, ext_id_to_title, without_usable_ids,
+                    match_cache: dict | None = None):
+    """Pair the IDs left over after an ID diff by title; returns the same tuple as reconcile.
+
+    The leftover IDs come in ID order, and only their titles are read from the title maps.
+    """
+    # Find potential name matches for items with IDs
+    plex_unmatched = {id: plex_id_to_title[id] for id in plex_not_in_ext}
+    ext_unmatched = {id: ext_id_to_title[id] for id in ext_not_in_plex}
+    name_matches = find_name_matches_incremental(plex_unmatched, ext_unmatched,
+                                                 (match_cache or {}).get("id"), TITLE_MATCH_THRESHOLD)
+    if match_cache is not None:
+        match_cache["id"] = {"plex": plex_unmatched, "external": ext_unmatched,
+                             "matches": dict(name_matches), "threshold": TITLE_MATCH_THRESHOLD}
+
+    # Now find matches for items without usable IDs
+    if without_usable_ids:
+        # Create a temporary dict for items without IDs (use title as both key and value)
+        plex_no_id_dict = {title: title for title in without_usable_ids}
+        no_id_matches = find_name_matches_incremental(plex_no_id_dict, ext_unmatched,
+                                                      (match_cache or {}).get("no_id"), TITLE_MATCH_THRESHOLD)
+        if match_cache is not None:
+            match_cache["no_id"] = {"plex": plex_no_id_dict, "external": ext_unmatched,
+                                    "matches": dict(no_id_matches), "threshold": TITLE_MATCH_THRESHOLD}
 
-    # Now find matches for movies without usable IDs
-    if movies_without_usable_ids:
-        # Create a temporary dict for movies without IDs (use title as both key and value)
-        plex_no_id_dict = {title: title for title in movies_without_usable_ids}
-        no_id_matches = find_name_matches(plex_no_id_dict, radarr_unmatched_movies)
-        
         # Add these matches to our main matches dict (using a special key format)
-        for plex_title, radarr_id in no_id_matches.items():
-            movie_name_matches[f"NO_ID:{plex_title}"] = radarr_id
-            # Remove from radarr unmatched since we found a match
-            radarr_movies_not_in_plex.discard(radarr_id)
+        for plex_title, (ext_id, score) in no_id_matches.items():
+            name_matches[f"NO_ID:{plex_title}"] = (ext_id, score)
 
     # Remove name matches from unmatched lists
-    final_plex_movies_not_in_radarr = plex_movies_not_in_radarr - set(movie_name_matches.keys())
-    final_radarr_movies_not_in_plex = radarr_movies_not_in_plex - set(movie_name_matches.values())
+    matched_ext_ids = {ext_id for ext_id, _ in name_matches.values()}
+    final_plex_not_in_ext = [id for id in plex_not_in_ext if id not in name_matches]
+    final_ext_not_in_plex = [id for id in ext_not_in_plex if id not in matched_ext_ids]
+    return final_plex_not_in_ext, final_ext_not_in_plex, name_matches
+
+def title_match_rows(name_matches, plex_id_to_title, ext_id_to_title):
+    """Title matches as (plex_id or None, ext_id, plex_title, ext_title, score), sorted by Plex title"""
+    rows = []
+    for plex_id, (ext_id, score) in name_matches.items():
+        if isinstance(plex_id, int):
+            rows.append((plex_id, ext_id, plex_id_to_title[plex_id], ext_id_to_title[ext_id], score))
+        else:
+            plex_title = plex_id.split("NO_ID:")[1]
+            rows.append((None, ext_id, plex_title, ext_id_to_title[ext_id], score))
+    rows.sort(key=lambda x: x[2].lower())
+    return rows
+
+@profiled("movie_compare")
+def compare_movies(plex_tmdb_ids, plex_movie_id_to_title, radarr_tmdb_ids, radarr_movie_id_to_title, movies_without_usable_ids,
+                   match_cache: dict | None = None, label: str | None = None):
+    print("\n" + "="*50)
+    print("🎬 MOVIE COMPARISON" if label is None else f"🎬 MOVIE COMPARISON ({label})")
+    print("="*50)
+
+    final_plex_movies_not_in_radarr, final_radarr_movies_not_in_plex, movie_name_matches = reconcile(
+        plex_tmdb_ids, plex_movie_id_to_title, radarr_tmdb_ids, radarr_movie_id_to_title,
+        movies_without_usable_ids, match_cache)
 
     print(f"\nMovies in Plex but not in Radarr ({len(final_plex_movies_not_in_radarr)}):")
     for tmdb_id in sorted(final_plex_movies_not_in_radarr, key=lambda x: plex_movie_id_to_title[x].lower()):
@@ -302,25 +1496,14 @@ def compare_movies(plex_tmdb_ids, plex_movie_id_to_title, radarr_tmdb_ids, radar
 
     if movie_name_matches:
         print(f"\nMovies matched by title (likely same content with different IDs) ({len(movie_name_matches)}):")
-        # Sort matches for consistent output
-        sorted_matches = []
-        for plex_id, radarr_id in movie_name_matches.items():
-            if isinstance(plex_id, int):
-                sorted_matches.append((plex_id, radarr_id, plex_movie_id_to_title[plex_id], radarr_movie_id_to_title[radarr_id]))
-            else:
-                plex_title = plex_id.split("NO_ID:")[1]
-                sorted_matches.append((None, radarr_id, plex_title, radarr_movie_id_to_title[radarr_id]))
-        
-        # Sort by title
-        sorted_matches.sort(key=lambda x: x[2].lower())
-        
-        for plex_id, radarr_id, plex_title, radarr_title in sorted_matches:
+        for plex_id, radarr_id, plex_title, radarr_title, score in title_match_rows(
+                movie_name_matches, plex_movie_id_to_title, radarr_movie_id_to_title):
             if plex_id is not None:
                 print(f" - Plex: {plex_title} (tmdbId: {plex_id})")
-                print(f"   Radarr: {radarr_title} (tmdbId: {radarr_id})")
+                print(f"   Radarr: {radarr_title} (tmdbId: {radarr_id}) [score: {score:.2f}]")
             else:
                 print(f" - Plex: {plex_title} (no usable ID)")
-                print(f"   Radarr: {radarr_title} (tmdbId: {radarr_id})")
+                print(f"   Radarr: {radarr_title} (tmdbId: {radarr_id}) [score: {score:.2f}]")
 
     return {
         'plex_only': len(final_plex_movies_not_in_radarr),
@@ -328,34 +1511,18 @@ def compare_movies(plex_tmdb_ids, plex_movie_id_to_title, radarr_tmdb_ids, radar
         'matched_by_title': len(movie_name_matches)
     }
 
-def compare_tv_shows(plex_tvdb_ids, plex_show_id_to_title, sonarr_tvdb_ids, sonarr_show_id_to_title, shows_without_usable_ids):
+@profiled("show_compare")
+def compare_tv_shows(plex_tvdb_ids, plex_show_id_to_title, sonarr_tvdb_ids, sonarr_show_id_to_title, shows_without_usable_ids,
+                     match_cache: dict | None = None, label: str | None = None):
     print("\n" + "="*50)
-    print("📺 TV SHOW COMPARISON")
+    print("📺 TV SHOW COMPARISON" if label is None else f"📺 TV SHOW COMPARISON ({label})")
     print("="*50)
 
-    plex_shows_not_in_sonarr = plex_tvdb_ids - sonarr_tvdb_ids
-    sonarr_shows_not_in_plex = sonarr_tvdb_ids - plex_tvdb_ids
-
-    # Find potential name matches for TV shows with IDs
-    plex_unmatched_shows = {id: plex_show_id_to_title[id] for id in plex_shows_not_in_sonarr}
-    sonarr_unmatched_shows = {id: sonarr_show_id_to_title[id] for id in sonarr_shows_not_in_plex}
-    show_name_matches = find_name_matches(plex_unmatched_shows, sonarr_unmatched_shows)
-
-    # Now find matches for shows without usable IDs
     if shows_without_usable_ids:
         print("\n🔍 Checking for matches with TV shows without usable IDs...")
-        # Create a temporary dict for shows without IDs (use title as both key and value)
-        plex_no_id_dict = {title: title for title in shows_without_usable_ids}
-        no_id_matches = find_name_matches(plex_no_id_dict, sonarr_unmatched_shows)
-        
-        for plex_title, sonarr_id in no_id_matches.items():
-            show_name_matches[f"NO_ID:{plex_title}"] = sonarr_id
-            # Remove from sonarr unmatched since we found a match
-            sonarr_shows_not_in_plex.discard(sonarr_id)
-
-    # Remove name matches from unmatched lists
-    final_plex_shows_not_in_sonarr = plex_shows_not_in_sonarr - set(show_name_matches.keys())
-    final_sonarr_shows_not_in_plex = sonarr_shows_not_in_plex - set(show_name_matches.values())
+    final_plex_shows_not_in_sonarr, final_sonarr_shows_not_in_plex, show_name_matches = reconcile(
+        plex_tvdb_ids, plex_show_id_to_title, sonarr_tvdb_ids, sonarr_show_id_to_title,
+        shows_without_usable_ids, match_cache)
 
     print(f"\nTV Shows in Plex but not in Sonarr ({len(final_plex_shows_not_in_sonarr)}):")
     for tvdb_id in sorted(final_plex_shows_not_in_sonarr, key=lambda x: plex_show_id_to_title[x].lower()):
@@ -367,25 +1534,14 @@ def compare_tv_shows(plex_tvdb_ids, plex_show_id_to_title, sonarr_tvdb_ids, sona
 
     if show_name_matches:
         print(f"\nTV Shows matched by title (likely same content with different IDs) ({len(show_name_matches)}):")
-        # Sort matches for consistent output
-        sorted_show_matches = []
-        for plex_id, sonarr_id in show_name_matches.items():
-            if isinstance(plex_id, int):
-                sorted_show_matches.append((plex_id, sonarr_id, plex_show_id_to_title[plex_id], sonarr_show_id_to_title[sonarr_id]))
-            else:
-                plex_title = plex_id.split("NO_ID:")[1]
-                sorted_show_matches.append((None, sonarr_id, plex_title, sonarr_show_id_to_title[sonarr_id]))
-        
-        # Sort by title
-        sorted_show_matches.sort(key=lambda x: x[2].lower())
-        
-        for plex_id, sonarr_id, plex_title, sonarr_title in sorted_show_matches:
+        for plex_id, sonarr_id, plex_title, sonarr_title, score in title_match_rows(
+                show_name_matches, plex_show_id_to_title, sonarr_show_id_to_title):
             if plex_id is not None:
                 print(f" - Plex: {plex_title} (tvdbId: {plex_id})")
-                print(f"   Sonarr: {sonarr_title} (tvdbId: {sonarr_id})")
+                print(f"   Sonarr: {sonarr_title} (tvdbId: {sonarr_id}) [score: {score:.2f}]")
             else:
                 print(f" - Plex: {plex_title} (no usable ID)")
-                print(f"   Sonarr: {sonarr_title} (tvdbId: {sonarr_id})")
+                print(f"   Sonarr: {sonarr_title} (tvdbId: {sonarr_id}) [score: {score:.2f}]")
 
     return {
         'plex_only': len(final_plex_shows_not_in_sonarr),
@@ -393,73 +1549,412 @@ def compare_tv_shows(plex_tvdb_ids, plex_show_id_to_title, sonarr_tvdb_ids, sona
         'matched_by_title': len(show_name_matches)
     }
 
+def format_episode_numbers(numbers) -> str:
+    """Compact episode numbers into ranges, e.g. E01-E03, E07"""
+    numbers = sorted(set(numbers))
+    ranges = []
+    start = prev = numbers[0]
+    for number in numbers[1:] + [None]:
+        if number is not None and number == prev + 1:
+            prev = number
+            continue
+        ranges.append(f"E{start:02d}" if start == prev else f"E{start:02d}-E{prev:02d}")
+        if number is not None:
+            start = prev = number
+    return ", ".join(ranges)
+
+def print_episode_groups(heading: str, keys, titles: dict):
+    """Print (tvdb_id, season, episode) keys grouped by series and season"""
+    print(f"\n{heading} ({len(keys)}):")
+    by_series = {}
+    for tvdb_id, season, episode in keys:
+        by_series.setdefault(tvdb_id, {}).setdefault(season, []).append(episode)
+    for tvdb_id in sorted(by_series, key=lambda x: str(titles.get(x, x)).lower()):
+        print(f" - {titles.get(tvdb_id, tvdb_id)} (tvdbId: {tvdb_id})")
+        for season in sorted(by_series[tvdb_id]):
+            print(f"   Season {season}: {format_episode_numbers(by_series[tvdb_id][season])}")
+
+@profiled("episode_compare", lambda result, args: len(args[0]))
+def compare_episodes(plex_episodes, plex_tvdb_by_key, sonarr_episodes, show_titles, label: str | None = None,
+                     failed=()):
+    """Compare episodes of series that are in both Plex and Sonarr, joined on (tvdbId, season, episode).
+
+    plex_episodes is [(show_rating_key, season, episode)] and sonarr_episodes {tvdb_id: [(season, episode, has_file)]}.
+    Series in `failed` (tvdb IDs whose Sonarr episodes couldn't be fetched) are skipped.
+    """
+    print("\n" + "="*50)
+    print("📼 EPISODE COMPARISON" if label is None else f"📼 EPISODE COMPARISON ({label})")
+    print("="*50)
+
+    plex_keys = set()
+    for show_key, season, episode in plex_episodes:
+        tvdb_id = plex_tvdb_by_key.get(show_key)
+        if tvdb_id:
+            plex_keys.add((tvdb_id, season, episode))
+    sonarr_keys = {(tvdb_id, season, episode) for tvdb_id, episodes in sonarr_episodes.items()
+                   for season, episode, has_file in episodes
+                   if has_file and season is not None and episode is not None}
+
+    # Series missing entirely from one side, or without any files in Sonarr, are already reported by the
+    # TV show comparison
+    plex_series = set(plex_tvdb_by_key.values())
+    sonarr_series = {tvdb_id for tvdb_id, _, _ in sonarr_keys}
+    sonarr_only = [key for key in sonarr_keys - plex_keys if key[0] in plex_series]
+    plex_only = [key for key in plex_keys - sonarr_keys if key[0] in sonarr_series]
+
+    print_episode_groups("Episodes in Sonarr (downloaded) but not in Plex", sonarr_only, show_titles)
+    print_episode_groups("Episodes in Plex but not in Sonarr (downloaded)", plex_only, show_titles)
+    if failed:
+        print(f"\n⚠️ Skipped {len(failed)} series whose Sonarr episodes could not be fetched:")
+        for title in sorted((show_titles.get(tvdb_id, str(tvdb_id)) for tvdb_id in failed), key=str.lower):
+            print(f" - {title}")
+
+    return {
+        'plex_only': len(plex_only),
+        'sonarr_only': len(sonarr_only),
+        'failed': len(failed)
+    }
+
+# -----------------------------
+# INCREMENTAL SNAPSHOTS
+# -----------------------------
+SNAPSHOT_VERSION = 3
+
+def _encode_match_state(state: dict) -> dict:
+    return {
+        "plex": list(state["plex"].items()),
+        "external": list(state["external"].items()),
+        "matches": [[plex_id, ext_id, score] for plex_id, (ext_id, score) in state["matches"].items()],
+        "threshold": state["threshold"],
+    }
+
+def _decode_match_state(state: dict) -> dict:
+    return {
+        "plex": dict(map(tuple, state["plex"])),
+        "external": dict(map(tuple, state["external"])),
+        "matches": {plex_id: (ext_id, score) for plex_id, ext_id, score in state["matches"]},
+        "threshold": state["threshold"],
+    }
+
+def load_snapshot(path: str) -> dict | None:
+    """Load the previous run's snapshot, or None if there is no usable one"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != SNAPSHOT_VERSION:
+        return None
+    return {
+        "started": data["started"],
+        "sections": {section: {key: tuple(entry) for key, entry in entries.items()}
+                     for section, entries in data["sections"].items()},
+        "catalogs": {name: dict(map(tuple, catalog)) for name, catalog in data["catalogs"].items()},
+        "matches": {pairing: {name: _decode_match_state(state) for name, state in cache.items()}
+                    for pairing, cache in data["matches"].items()},
+    }
+
+def save_snapshot(path: str, snapshot: dict):
+    """Atomically write the snapshot used by the next incremental run"""
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "started": snapshot["started"],
+        "sections": snapshot["sections"],
+        "catalogs": {name: list(catalog.items()) for name, catalog in snapshot["catalogs"].items()},
+        "matches": {pairing: {name: _encode_match_state(state) for name, state in cache.items()}
+                    for pairing, cache in snapshot["matches"].items()},
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def diff_catalog(previous: dict, current: dict) -> tuple[int, int, int]:
+    """Count (added, removed, renamed) IDs between two {id: title} catalogs"""
+    added = sum(1 for id in current if id not in previous)
+    removed = sum(1 for id in previous if id not in current)
+    renamed = sum(1 for id, title in current.items() if id in previous and previous[id] != title)
+    return added, removed, renamed
+
+# -----------------------------
+# SHARDING
+# -----------------------------
+def configured_pairings():
+    """Return ({name: instance}, [pairing]) from ARR_INSTANCES/PAIRINGS, or the single Movies/TV Shows setup"""
+    if not PAIRINGS:
+        instances = {"radarr": arr_instance("radarr"), "sonarr": arr_instance("sonarr")}
+        pairings = [{"name": "Movies", "kind": "movie", "sections": ["Movies"], "instances": ["radarr"]},
+                    {"name": "TV Shows", "kind": "show", "sections": ["TV Shows"], "instances": ["sonarr"]}]
+        return instances, pairings
+
+    instances = {}
+    for name, config in ARR_INSTANCES.items():
+        if config.get("type") not in ("radarr", "sonarr"):
+            raise ValueError(f"ARR instance '{name}' needs a type of 'radarr' or 'sonarr'")
+        instances[name] = {"name": name, "type": config["type"], "url": config["url"].rstrip("/"),
+                           "api_key": config["api_key"], "concurrency": config.get("concurrency", LOOKUP_CONCURRENCY)}
+
+    pairings = []
+    for pairing in PAIRINGS:
+        name = pairing["name"]
+        unknown = [instance for instance in pairing["instances"] if instance not in instances]
+        if unknown:
+            raise ValueError(f"Pairing '{name}' uses unknown ARR instances: {', '.join(unknown)}")
+        types = {instances[instance]["type"] for instance in pairing["instances"]}
+        if len(types) != 1 or not pairing["sections"]:
+            raise ValueError(f"Pairing '{name}' needs Plex sections and ARR instances of a single type")
+        pairings.append({"name": name, "kind": "movie" if types == {"radarr"} else "show",
+                         "sections": list(pairing["sections"]), "instances": list(pairing["instances"])})
+    return instances, pairings
+
+def merge_arr_catalogs(catalogs):
+    """Merge the (Catalog, index) of several ARR instances; the first instance wins on conflicts"""
+    if len(catalogs) == 1:
+        return catalogs[0]
+    id_to_title = {}
+    index = {}
+    for catalog, instance_index in catalogs:
+        for id, title in catalog.items():
+            id_to_title.setdefault(id, title)
+        for kind, mapping in instance_index.items():
+            merged = index.setdefault(kind, {})
+            for key, value in mapping.items():
+                merged.setdefault(key, value)
+    return build_catalog(id_to_title), index
+
 # -----------------------------
 # SUMMARY FUNCTION
 # -----------------------------
-def print_summary(plex_movie_count, radarr_movie_count, plex_show_count, sonarr_show_count, 
-                 movie_stats, show_stats, total_plex_movies, total_plex_shows,
-                 movies_without_usable_ids, shows_without_usable_ids, 
-                 movie_duplicates, show_duplicates):
+@profiled("summary")
+def print_summary(movie_results, show_results):
+    """Print totals per pairing; each result holds the name, label, Plex figures, ARR count and comparison stats"""
     print("\n" + "="*50)
     print("📊 SUMMARY")
     print("="*50)
-    print(f"Total Movies in Plex: {total_plex_movies}")
-    print(f"Total Movies with usable IDs: {plex_movie_count}")
-    print(f"Total Movies without usable IDs: {len(movies_without_usable_ids)}")
-    print(f"Total duplicate movies (unique IDs): {len(movie_duplicates)}")
-    print(f"Total Movies in Radarr (downloaded): {radarr_movie_count}")
-    
-    print(f"\nTotal TV Shows in Plex: {total_plex_shows}")
-    print(f"Total TV Shows with usable IDs: {plex_show_count}")
-    print(f"Total TV Shows without usable IDs: {len(shows_without_usable_ids)}")
-    print(f"Total duplicate TV shows (unique IDs): {len(show_duplicates)}")
-    print(f"Total TV Shows in Sonarr (downloaded): {sonarr_show_count}")
-    
-    print(f"\nMovies only in Plex: {movie_stats['plex_only']}")
-    print(f"Movies only in Radarr: {movie_stats['radarr_only']}")
-    print(f"TV Shows only in Plex: {show_stats['plex_only']}")
-    print(f"TV Shows only in Sonarr: {show_stats['sonarr_only']}")
-    
-    # Verify the math
-    total_duplicate_movie_entries = sum(len(titles) for titles in movie_duplicates.values())
-    total_duplicate_show_entries = sum(len(titles) for titles in show_duplicates.values())
-    
-    movie_expected_total = plex_movie_count + len(movies_without_usable_ids) + total_duplicate_movie_entries
-    show_expected_total = plex_show_count + len(shows_without_usable_ids) + total_duplicate_show_entries
+    results = [(result, "Movies", "movies", "Radarr") for result in movie_results] + \
+              [(result, "TV Shows", "TV shows", "Sonarr") for result in show_results]
+    for i, (result, kind, noun, arr) in enumerate(results):
+        suffix = f" ({result['label']})" if result["label"] else ""
+        if i:
+            print()
+        print(f"Total {kind} in Plex{suffix}: {result['total']}")
+        print(f"Total {kind} with usable IDs{suffix}: {result['plex_count']}")
+        print(f"Total {kind} without usable IDs{suffix}: {len(result['without_ids'])}")
+        print(f"Total duplicate {noun} (unique IDs){suffix}: {result['duplicates']}")
+        print(f"Total {kind} in {arr} (downloaded){suffix}: {result['arr_count']}")
+
+    print()
+    for result, kind, noun, arr in results:
+        suffix = f" ({result['label']})" if result["label"] else ""
+        print(f"{kind} only in Plex{suffix}: {result['stats']['plex_only']}")
+        print(f"{kind} only in {arr}{suffix}: {result['stats'][arr.lower() + '_only']}")
+        if result.get("episodes"):
+            print(f"Episodes only in Plex{suffix}: {result['episodes']['plex_only']}")
+            print(f"Episodes only in Sonarr{suffix}: {result['episodes']['sonarr_only']}")
+            if result["episodes"]["failed"]:
+                print(f"Series skipped, episodes not fetched{suffix}: {result['episodes']['failed']}")
+
+    print(f"\nIDs resolved from the Radarr/Sonarr catalogs: {LOOKUP_STATS['local']}")
+    print(f"IDs resolved by remote lookups: {LOOKUP_STATS['remote']}")
+    if LOOKUP_STATS["failed"]:
+        print(f"ID lookups that failed (retried next run): {LOOKUP_STATS['failed']}")
+    print(f"ID lookup cache hits: {ID_CACHE.hits}")
+    print(f"ID lookup cache misses: {ID_CACHE.misses}")
+
+    peak_mb = peak_rss_mb()
+    if peak_mb is not None:
+        print(f"Peak memory (RSS): {peak_mb:.1f} MB")
 
 # -----------------------------
 # MAIN FUNCTION
 # -----------------------------
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-check Movies and TV Shows between Plex and Radarr/Sonarr")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-read Plex items changed since the last run, using the saved snapshot")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="ignore the saved snapshot, rescan everything and save a fresh snapshot")
+    parser.add_argument("--episodes", action="store_true",
+                        help="also compare episodes of the TV shows in both Plex and Sonarr")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_PATH, metavar="PATH",
+                        help="write per-phase timings and HTTP statistics as JSON (default: %(const)s)")
+    parser.add_argument("--prometheus", nargs="?", const=PROMETHEUS_PATH, metavar="PATH",
+                        help="write the same statistics for the Prometheus textfile collector (default: %(const)s)")
+    args = parser.parse_args(argv)
+
+    global PROFILER
+    PROFILER = Profiler() if args.profile or args.prometheus else None
+    # The summary reports this run's lookups only
+    with _lookup_stats_lock:
+        LOOKUP_STATS.update(dict.fromkeys(LOOKUP_STATS, 0))
+    ID_CACHE.hits = ID_CACHE.misses = 0
+
     print(f"Plex VS ARRs Check {VERSION} (https://github.com/netplexflix/scripts-for-plex)")
     try:
-        # Fetch Plex data
-        plex_tmdb_ids, plex_movie_id_to_title, total_plex_movies, movies_without_usable_ids, movie_duplicates = fetch_plex_movies()
-        plex_tvdb_ids, plex_show_id_to_title, total_plex_shows, shows_without_usable_ids, show_duplicates = fetch_plex_tv_shows()
-        
-        # Fetch ARR data
-        radarr_tmdb_ids, radarr_movie_id_to_title = fetch_radarr_movies()
-        sonarr_tvdb_ids, sonarr_show_id_to_title = fetch_sonarr_tv_shows()
-        
-        # Perform comparisons
-        movie_stats = compare_movies(plex_tmdb_ids, plex_movie_id_to_title, 
-                                   radarr_tmdb_ids, radarr_movie_id_to_title,
-                                   movies_without_usable_ids)
-        
-        show_stats = compare_tv_shows(plex_tvdb_ids, plex_show_id_to_title, 
-                                    sonarr_tvdb_ids, sonarr_show_id_to_title,
-                                    shows_without_usable_ids)
-        
+        save_state = args.incremental or args.full_refresh
+        snapshot = load_snapshot(SNAPSHOT_PATH) if args.incremental and not args.full_refresh else None
+        started = int(time.time())
+        since = snapshot["started"] - SNAPSHOT_SAFETY_MARGIN if snapshot else None
+        if args.incremental and snapshot is None:
+            print("\n♻️ No usable snapshot found, doing a full refresh")
+
+        instances, pairings = configured_pairings()
+        # Shard names are only shown when several libraries/instances are configured
+        labeled = bool(PAIRINGS)
+        sections = {}
+        for pairing in pairings:
+            for section in pairing["sections"]:
+                sections.setdefault(section, pairing["kind"])
+        used_instances = list(dict.fromkeys(name for pairing in pairings for name in pairing["instances"]))
+
+        plex = PlexServer(PLEX_URL, PLEX_TOKEN, session=get_session(PLEX_URL))
+
+        # Every ARR instance and every Plex section is a shard fetched in parallel, so the run takes as
+        # long as the largest shard. Each shard's output is buffered so the report prints in a stable order
+        instance_out = {name: io.StringIO() for name in used_instances}
+        section_out = {section: io.StringIO() for section in sections}
+        episode_out = {section: io.StringIO() for section in sections}
+        pairing_out = {pairing["name"]: io.StringIO() for pairing in pairings}
+        try:
+            with ThreadPoolExecutor(max_workers=len(used_instances) + len(sections)) as pool:
+                catalog_futures = {}
+                for name in used_instances:
+                    instance = instances[name]
+                    fetch = fetch_radarr_movies if instance["type"] == "radarr" else fetch_sonarr_tv_shows
+                    catalog_futures[name] = pool.submit(fetch, instance_out[name], instance if labeled else None)
+                scan_futures = {}
+                for section, kind in sections.items():
+                    scan = scan_plex_movies if kind == "movie" else scan_plex_tv_shows
+                    previous = snapshot["sections"].get(section) if snapshot else None
+                    scan_futures[section] = pool.submit(scan, plex, section_out[section], previous, since, section)
+                episode_futures = {}
+                if args.episodes:
+                    for section, kind in sections.items():
+                        if kind == "show":
+                            episode_futures[section] = pool.submit(scan_plex_episodes, plex, section,
+                                                                   episode_out[section])
+
+                catalogs = {name: future.result() for name, future in catalog_futures.items()}
+                section_entries = {section: future.result() for section, future in scan_futures.items()}
+                section_episodes = {section: future.result() for section, future in episode_futures.items()}
+
+            if snapshot:
+                for name, (_, id_to_title, _) in catalogs.items():
+                    if name in snapshot["catalogs"]:
+                        print("♻️ %d added, %d removed, %d renamed since the last run" % diff_catalog(
+                            snapshot["catalogs"][name], id_to_title), file=instance_out[name])
+                del snapshot["catalogs"]
+            # From here on ARR catalogs are only kept in compact form; their ID sets and title maps are dropped
+            catalogs = {name: (build_catalog(id_to_title), index)
+                        for name, (_, id_to_title, index) in catalogs.items()}
+
+            def resolve_pairing(pairing):
+                """Merge the pairing's shards, resolve its Plex IDs against the merged ARR index and pack the
+                result into a Catalog; returns (arr_catalog, plex_catalog, total, episodes)"""
+                entries = {key: entry for section in pairing["sections"]
+                           for key, entry in section_entries[section].items()}
+                arr_catalog, index = merge_arr_catalogs([catalogs[name] for name in pairing["instances"]])
+                # Remote lookups go to the pairing's first instance, within that instance's concurrency limit
+                instance = instances[pairing["instances"][0]] if labeled else None
+                if labeled:
+                    print(f"\n🔗 {pairing['name']}: Plex {', '.join(pairing['sections'])} vs "
+                          f"{', '.join(pairing['instances'])}", file=pairing_out[pairing["name"]])
+                fetch = fetch_plex_movies if pairing["kind"] == "movie" else fetch_plex_tv_shows
+                # The duplicates are listed by fetch; from here on the catalog's DUPLICATE flags stand in for them
+                _, plex_id_to_title, total, without_usable_ids, duplicates = fetch(
+                    plex, index, entries, pairing_out[pairing["name"]], instance)
+                plex_catalog = build_catalog(plex_id_to_title, without_usable_ids, duplicates)
+                if not args.episodes or pairing["kind"] != "show":
+                    return arr_catalog, plex_catalog, total, None
+
+                # Episodes are only compared for series in Plex, so only those are fetched from Sonarr
+                tvdb_by_key = show_tvdb_by_key(entries, index)
+                wanted = set(tvdb_by_key.values())
+                sonarr_episodes = {}
+                failed = set()
+                for name in pairing["instances"]:
+                    tvdb_to_series = catalogs[name][1]["tvdb_to_series"]
+                    series_to_tvdb = {tvdb_to_series[tvdb_id]: tvdb_id for tvdb_id in wanted
+                                      if tvdb_id in tvdb_to_series}
+                    fetched, fetch_failed = fetch_sonarr_episodes(series_to_tvdb, instances[name] if labeled else None,
+                                                                  pairing_out[pairing["name"]])
+                    for series_id, episodes in fetched.items():
+                        sonarr_episodes.setdefault(series_to_tvdb[series_id], []).extend(episodes)
+                    failed.update(series_to_tvdb[series_id] for series_id in fetch_failed)
+                # A series split over several instances is only compared if every instance answered
+                for tvdb_id in failed:
+                    sonarr_episodes.pop(tvdb_id, None)
+                plex_episodes = [episode for section in pairing["sections"] for episode in section_episodes[section]]
+                return arr_catalog, plex_catalog, total, \
+                    (plex_episodes, tvdb_by_key, sonarr_episodes, sorted(failed))
+
+            with ThreadPoolExecutor(max_workers=len(pairings)) as pool:
+                resolved = dict(zip((pairing["name"] for pairing in pairings), pool.map(resolve_pairing, pairings)))
+        finally:
+            for buffer in instance_out.values():
+                print(buffer.getvalue(), end="")
+            printed = set()
+            for pairing in pairings:
+                for section in pairing["sections"]:
+                    if section not in printed:
+                        printed.add(section)
+                        print(section_out[section].getvalue(), end="")
+                        print(episode_out[section].getvalue(), end="")
+                print(pairing_out[pairing["name"]].getvalue(), end="")
+
+        # Perform comparisons; title matches from the snapshot are only recomputed where inputs changed
+        match_caches = {}
+        movie_results = []
+        show_results = []
+        for pairing in pairings:
+            name = pairing["name"]
+            arr_catalog, plex_catalog, total, episodes = resolved[name]
+            match_cache = (snapshot["matches"].get(name, {}) if snapshot else {}) if save_state else None
+            compare = compare_movies if pairing["kind"] == "movie" else compare_tv_shows
+            # Each catalog stands in for both its ID set and its title map
+            without_usable_ids = plex_catalog.without_ids()
+            stats = compare(plex_catalog, plex_catalog, arr_catalog, arr_catalog, without_usable_ids,
+                            match_cache, name if labeled else None)
+            match_caches[name] = match_cache
+            episode_stats = None
+            if episodes is not None:
+                plex_episodes, tvdb_by_key, sonarr_episodes, failed = episodes
+                episode_stats = compare_episodes(plex_episodes, tvdb_by_key, sonarr_episodes,
+                                                 ChainMap(plex_catalog, arr_catalog), name if labeled else None, failed)
+            (movie_results if pairing["kind"] == "movie" else show_results).append({
+                "label": name if labeled else None,
+                "total": total,
+                "plex_count": len(plex_catalog),
+                "without_ids": without_usable_ids,
+                "duplicates": len(plex_catalog.flagged(DUPLICATE)),
+                "arr_count": len(arr_catalog),
+                "stats": stats,
+                "episodes": episode_stats,
+            })
+
         # Print summary
-        print_summary(len(plex_tmdb_ids), len(radarr_tmdb_ids), 
-                     len(plex_tvdb_ids), len(sonarr_tvdb_ids),
-                     movie_stats, show_stats, total_plex_movies, total_plex_shows,
-                     movies_without_usable_ids, shows_without_usable_ids,
-                     movie_duplicates, show_duplicates)
-        
+        print_summary(movie_results, show_results)
+
+        if save_state:
+            save_snapshot(SNAPSHOT_PATH, {
+                "started": started,
+                "sections": section_entries,
+                "catalogs": {name: catalog for name, (catalog, _) in catalogs.items()},
+                "matches": match_caches,
+            })
+
     except Exception as e:
         print(f"❌ Error occurred: {str(e)}")
         raise
+    finally:
+        ID_CACHE.close()
+        if PROFILER is not None:
+            if args.profile:
+                PROFILER.write_json(args.profile)
+                print(f"\n📈 Profile written to {args.profile}")
+            if args.prometheus:
+                PROFILER.write_prometheus(args.prometheus)
+                print(f"📈 Prometheus metrics written to {args.prometheus}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,557 @@
+import argparse
+import io
+import json
+import queue
+import threading
+import time
+from bisect import insort
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from plexapi.exceptions import NotFound
+from plexapi.server import PlexServer
+
+import PVAC
+
+VERSION = 1.0
+
+# -----------------------------
+# CONFIGURATION
+# -----------------------------
+# Plex, Radarr and Sonarr connection settings are read from PVAC.py. The service compares one movie and one
+# TV show section with RADARR_*/SONARR_*; ARR_INSTANCES and PAIRINGS are not supported
+
+SERVICE_HOST = "127.0.0.1"       # Interface the webhook/report listener binds to
+SERVICE_PORT = 8787
+WEBHOOK_TOKEN = ""               # If set, every request must carry ?token=<WEBHOOK_TOKEN>
+RESYNC_INTERVAL_HOURS = 6        # Periodic resync to catch changes no webhook reports (e.g. Plex deletions)
+
+# Plex sections PVAC compares; webhook events for other sections are ignored
+PLEX_MOVIE_SECTION = "Movies"
+PLEX_SHOW_SECTION = "TV Shows"
+
+# -----------------------------
+# ARR FETCHING
+# -----------------------------
+def fetch_arr_catalog(base_url: str, api_key: str, resource: str, iter_items) -> dict:
+    """Stream a full Radarr/Sonarr catalog into {arr_id: ArrItem}"""
+    with PVAC.get_session(base_url).get(
+        f"{base_url}/{resource}",
+        params={"apikey": api_key},
+        timeout=PVAC.REQUEST_TIMEOUT,
+        stream=True
+    ) as resp:
+        resp.raise_for_status()
+        return {item.arr_id: item for item in iter_items(resp)}
+
+def fetch_arr_item(base_url: str, api_key: str, resource: str, arr_id: int, make_item):
+    """Fetch one Radarr movie or Sonarr series as an ArrItem, or None if it no longer exists"""
+    resp = PVAC.get_session(base_url).get(
+        f"{base_url}/{resource}/{arr_id}",
+        params={"apikey": api_key},
+        timeout=PVAC.REQUEST_TIMEOUT
+    )
+    if resp.status_code == 404:
+        return None
+    resp.raise_for_status()
+    return make_item(resp.json())
+
+# -----------------------------
+# SERVICE STATE
+# -----------------------------
+class SectionIndex:
+    """One Plex section and its ARR catalog with every ID resolved, kept current one item at a time.
+
+    Alongside the entries it keeps the IDs found on one side only, the duplicates, the items without IDs
+    and the links find_duplicate_files groups on, so a report only reads the items it lists. All changes
+    come from the event worker; readers hold ReconcileState.lock.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind             # "movie" or "show"
+        self.entries = {}            # Plex ratingKey -> scanned entry
+        self.resolved = {}           # Plex ratingKey -> resolved ID, or None
+        self.plex_keys = {}          # ID -> Plex ratingKeys in ratingKey order
+        self.without_ids = set()     # Plex ratingKeys without a usable ID
+        self.duplicate_ids = set()   # IDs held by more than one Plex item
+        self.waiting = {}            # (lookup kind, key) -> Plex ratingKeys resolved through that lookup
+        self.arr_items = {}          # ARR id -> ArrItem
+        self.arr_keys = {}           # ID -> ARR ids of the downloaded items with it
+        # Cross-reference index used to resolve Plex items, with the ARR items behind each of its entries
+        self.index = {"imdb_to_tmdb": {}, "tvdb_to_tmdb": {}} if kind == "movie" else \
+            {"imdb_to_tvdb": {}, "tvdb_to_series": {}}
+        self.index_sources = {}      # (index kind, key) -> {ARR id: value}
+        self.plex_only = set()
+        self.arr_only = set()
+        self.link_keys = {}          # duplicate file link -> Plex ratingKeys with media
+        self.shared_links = set()    # links held by more than one Plex item
+        self.multi_version = set()   # Plex ratingKeys with more than one media version
+
+    def resolve(self, entries: dict) -> dict:
+        """Resolve entries to {ratingKey: ID}; IDs the index doesn't know are looked up (and cached) remotely"""
+        if not entries:
+            return {}
+        if self.kind == "movie":
+            PVAC.resolve_movie_entries(entries, self.index)
+            return PVAC.movie_tmdb_by_key(entries, self.index)
+        PVAC.resolve_show_entries(entries, self.index)
+        return PVAC.show_tvdb_by_key(entries, self.index)
+
+    def _lookups(self, entry: tuple) -> list:
+        if self.kind == "movie":
+            _, tmdb_id, imdb_id, tvdb_id, *_ = entry
+            lookups = [] if tmdb_id else [("imdb_to_tmdb", imdb_id), ("tvdb_to_tmdb", tvdb_id)]
+        else:
+            _, tvdb_id, imdb_id = entry
+            lookups = [] if tvdb_id else [("imdb_to_tvdb", imdb_id)]
+        return [lookup for lookup in lookups if lookup[1]]
+
+    def _links(self, key: str, entry: tuple) -> list:
+        if self.kind != "movie" or not entry[5]:
+            return []
+        id = self.resolved[key]
+        return [("title", PVAC.normalize_title(entry[0]), entry[4])] + ([("id", id)] if id is not None else [])
+
+    def _touch(self, id):
+        """Recompute which side-only set an ID belongs to"""
+        in_plex, in_arr = id in self.plex_keys, id in self.arr_keys
+        (self.plex_only.add if in_plex and not in_arr else self.plex_only.discard)(id)
+        (self.arr_only.add if in_arr and not in_plex else self.arr_only.discard)(id)
+        (self.duplicate_ids.add if len(self.plex_keys.get(id, ())) > 1 else self.duplicate_ids.discard)(id)
+
+    def drop_plex(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        for link in self._links(key, entry):
+            keys = self.link_keys[link]
+            keys.discard(key)
+            if len(keys) < 2:
+                self.shared_links.discard(link)
+            if not keys:
+                del self.link_keys[link]
+        self.multi_version.discard(key)
+        for lookup in self._lookups(entry):
+            keys = self.waiting.get(lookup)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.waiting[lookup]
+        del self.entries[key]
+        id = self.resolved.pop(key)
+        if id is None:
+            self.without_ids.discard(key)
+            return
+        keys = self.plex_keys[id]
+        keys.remove(key)
+        if not keys:
+            del self.plex_keys[id]
+        self._touch(id)
+
+    def set_plex(self, key: str, entry: tuple, id):
+        """Add or replace one Plex item under its resolved ID"""
+        self.drop_plex(key)
+        self.entries[key] = entry
+        self.resolved[key] = id
+        if id is None:
+            self.without_ids.add(key)
+        else:
+            insort(self.plex_keys.setdefault(id, []), key, key=int)
+            self._touch(id)
+        for lookup in self._lookups(entry):
+            self.waiting.setdefault(lookup, set()).add(key)
+        for link in self._links(key, entry):
+            keys = self.link_keys.setdefault(link, set())
+            keys.add(key)
+            if len(keys) > 1:
+                self.shared_links.add(link)
+        if self.kind == "movie" and len(entry[5]) > 1:
+            self.multi_version.add(key)
+
+    def set_arr_item(self, arr_id: int, item) -> set:
+        """Replace or drop one ARR item; returns the Plex ratingKeys whose resolution may have changed"""
+        stale = set()
+        previous = self.arr_items.pop(arr_id, None)
+        if previous is not None:
+            stale |= self._index_arr_item(arr_id, previous, False)
+        if item is not None:
+            self.arr_items[arr_id] = item
+            stale |= self._index_arr_item(arr_id, item, True)
+        return stale
+
+    def _index_arr_item(self, arr_id: int, item, add: bool) -> set:
+        """Add or remove one ARR item's downloaded ID and cross-reference entries"""
+        build_maps = PVAC.build_radarr_maps if self.kind == "movie" else PVAC.build_sonarr_maps
+        ids, _, index = build_maps([item])
+        for id in ids:
+            arr_ids = self.arr_keys.setdefault(id, set())
+            (arr_ids.add if add else arr_ids.discard)(arr_id)
+            if not arr_ids:
+                del self.arr_keys[id]
+            self._touch(id)
+
+        stale = set()
+        for kind, mapping in index.items():
+            for key, value in mapping.items():
+                sources = self.index_sources.setdefault((kind, key), {})
+                if add:
+                    sources[arr_id] = value
+                else:
+                    sources.pop(arr_id, None)
+                # Several ARR items rarely share a cross-reference; the newest one decides it
+                current = sources[max(sources)] if sources else None
+                if not sources:
+                    del self.index_sources[(kind, key)]
+                if self.index[kind].get(key) != current:
+                    if current is None:
+                        del self.index[kind][key]
+                    else:
+                        self.index[kind][key] = current
+                    stale |= self.waiting.get((kind, key), set())
+        return stale
+
+    def plex_title(self, id) -> str:
+        return self.entries[self.plex_keys[id][0]][0]
+
+    def arr_title(self, id) -> str:
+        # Several ARR items with one ID are rare; the newest one names it
+        return self.arr_items[max(self.arr_keys[id])].title
+
+    def report(self, match_cache: dict, id_name: str, arr_name: str) -> dict:
+        """JSON report against the ARR, in the same terms as the PVAC.py output"""
+        plex_titles = {id: self.plex_title(id) for id in self.plex_only}
+        arr_titles = {id: self.arr_title(id) for id in self.arr_only}
+        without_usable_ids = [self.entries[key][0] for key in sorted(self.without_ids, key=int)]
+        plex_only, arr_only, name_matches = PVAC.match_leftovers(
+            sorted(self.plex_only), sorted(self.arr_only), plex_titles, arr_titles, without_usable_ids, match_cache)
+        # Listed in the order PVAC.py finds them: by the second item holding the ID
+        duplicates = sorted(self.duplicate_ids, key=lambda id: int(self.plex_keys[id][1]))
+        report = {
+            "plex_only": [{"title": plex_titles[i], id_name: i}
+                          for i in sorted(plex_only, key=lambda x: plex_titles[x].lower())],
+            f"{arr_name}_only": [{"title": arr_titles[i], id_name: i}
+                                 for i in sorted(arr_only, key=lambda x: arr_titles[x].lower())],
+            "title_matches": [{"plex_title": plex_title, f"plex_{id_name}": plex_id,
+                               f"{arr_name}_title": ext_title, f"{arr_name}_{id_name}": ext_id,
+                               "score": round(score, 4)}
+                              for plex_id, ext_id, plex_title, ext_title, score in
+                              PVAC.title_match_rows(name_matches, plex_titles, arr_titles)],
+            "duplicates": [{id_name: i, "titles": [self.entries[key][0] for key in self.plex_keys[i]]}
+                           for i in duplicates],
+            "without_ids": sorted(without_usable_ids),
+            "counts": {"plex": len(self.plex_keys), arr_name: len(self.arr_keys)},
+        }
+        if self.kind == "movie":
+            # Only items sharing a link or holding several versions can be in a duplicate group
+            keys = set(self.multi_version)
+            for link in self.shared_links:
+                keys |= self.link_keys[link]
+            groups = PVAC.find_duplicate_files({key: self.entries[key] for key in keys},
+                                               {key: self.resolved[key] for key in keys})
+            report["duplicate_files"] = duplicate_files_report(groups, id_name)
+        return report
+
+def build_section(kind: str, entries: dict, arr_items: dict) -> SectionIndex:
+    """Index a scanned Plex section against a full ARR catalog, resolving every Plex entry"""
+    section = SectionIndex(kind)
+    for arr_id, item in arr_items.items():
+        section.set_arr_item(arr_id, item)
+    resolved = section.resolve(entries)
+    for key in sorted(entries, key=int):
+        section.set_plex(key, entries[key], resolved.get(key))
+    return section
+
+class ReconcileState:
+    """Plex and ARR catalogs with their resolved IDs, updated per webhook event, with a cached report.
+
+    Only the event worker changes the state or talks to Plex and the ARRs; report() just reads under the lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.plex = None
+        self.movies = SectionIndex("movie")
+        self.shows = SectionIndex("show")
+        self.movie_match_cache = {}
+        self.show_match_cache = {}
+        self.last_sync = None
+        self.synced_at = None
+        self.events = 0
+        self._report = None
+        self._dirty = {"movie", "show"}  # kinds of the sections changed since the report was built
+
+    def connect(self):
+        if self.plex is None:
+            self.plex = PlexServer(PVAC.PLEX_URL, PVAC.PLEX_TOKEN)
+        return self.plex
+
+    def resync(self):
+        """Rescan Plex (only what changed since the last sync), reload both ARR catalogs and resolve every ID"""
+        plex = self.connect()
+        started = int(time.time())
+        since = self.last_sync - PVAC.SNAPSHOT_SAFETY_MARGIN if self.last_sync else None
+        previous_movies = self.movies.entries if since else None
+        previous_shows = self.shows.entries if since else None
+
+        out = io.StringIO()
+        movie_entries = PVAC.scan_plex_movies(plex, out, previous_movies, since, PLEX_MOVIE_SECTION)
+        show_entries = PVAC.scan_plex_tv_shows(plex, out, previous_shows, since, PLEX_SHOW_SECTION)
+        radarr = fetch_arr_catalog(PVAC.RADARR_URL, PVAC.RADARR_API_KEY, "movie", PVAC.iter_radarr_movies)
+        sonarr = fetch_arr_catalog(PVAC.SONARR_URL, PVAC.SONARR_API_KEY, "series", PVAC.iter_sonarr_series)
+        movies = build_section("movie", movie_entries, radarr)
+        shows = build_section("show", show_entries, sonarr)
+
+        with self.lock:
+            self.movies = movies
+            self.shows = shows
+            self.last_sync = started
+            self.synced_at = time.time()
+            self._dirty = {"movie", "show"}
+        PVAC.ID_CACHE.flush()
+        print(f"🔄 Resynced: {len(movie_entries)} Plex movies, {len(show_entries)} Plex TV shows, "
+              f"{len(radarr)} Radarr movies, {len(sonarr)} Sonarr TV shows")
+
+    def apply_plex_item(self, rating_key: str):
+        """Re-read and resolve one Plex item; it is dropped if Plex no longer has it"""
+        try:
+            data = self.connect().query(f"/library/metadata/{rating_key}?includeGuids=1")
+        except NotFound:
+            data = None
+        elem = next((e for e in data if e.tag in ("Video", "Directory")), None) if data is not None else None
+        section_title = data.attrib.get("librarySectionTitle") if data is not None else None
+
+        section = entry = None
+        if elem is not None and elem.attrib.get("type") == "movie" and section_title == PLEX_MOVIE_SECTION:
+            section, entry = self.movies, PVAC.movie_entry(PVAC.plex_item_from_element(elem))
+        elif elem is not None and elem.attrib.get("type") == "show" and section_title == PLEX_SHOW_SECTION:
+            section, entry = self.shows, PVAC.show_entry(PVAC.plex_item_from_element(elem))
+        id = section.resolve({rating_key: entry}).get(rating_key) if section else None
+
+        with self.lock:
+            for previous in (self.movies, self.shows):
+                if rating_key in previous.entries:
+                    previous.drop_plex(rating_key)
+                    self._dirty.add(previous.kind)
+            if section is not None:
+                section.set_plex(rating_key, entry, id)
+                self._dirty.add(section.kind)
+
+    def apply_arr_item(self, section: SectionIndex, arr_id: int, item):
+        """Replace or drop one Radarr/Sonarr entry, re-resolving the Plex items its IDs affect"""
+        with self.lock:
+            stale = section.set_arr_item(arr_id, item)
+            self._dirty.add(section.kind)
+        if not stale:
+            return
+        entries = {key: section.entries[key] for key in stale}
+        resolved = section.resolve(entries)
+        with self.lock:
+            for key, entry in entries.items():
+                section.set_plex(key, entry, resolved.get(key))
+
+    def report(self) -> dict:
+        """Current report; only the sections changed since it was last built are rebuilt, from the maintained IDs"""
+        with self.lock:
+            if self._dirty or self._report is None or self._report["events"] != self.events:
+                self._report = self._build_report(self._report or {})
+                self._dirty = set()
+            return self._report
+
+    def _build_report(self, previous: dict) -> dict:
+        movies = self.movies.report(self.movie_match_cache, "tmdbId", "radarr") \
+            if "movie" in self._dirty or not previous else previous["movies"]
+        shows = self.shows.report(self.show_match_cache, "tvdbId", "sonarr") \
+            if "show" in self._dirty or not previous else previous["shows"]
+        return {
+            "generated": time.time(),
+            "synced": self.synced_at,
+            "events": self.events,
+            "movies": movies,
+            "shows": shows,
+        }
+
+def duplicate_files_report(groups: list, id_name: str) -> list:
+    """JSON form of PVAC.find_duplicate_files groups, largest reclaimable first"""
+    return [{"match": kind, id_name if kind == "id" else "title": key if kind == "id" else key[0],
+             "reclaimable_bytes": reclaimable,
+             "copies": [{"title": title, "year": year, "file": file, "size": size, "resolution": resolution,
+                         "codec": codec} for title, year, file, size, resolution, codec in copies]}
+            for kind, key, copies, reclaimable in sorted(groups, key=lambda group: -group[3])]
+
+# -----------------------------
+# EVENT HANDLING
+# -----------------------------
+def plex_event_key(payload: dict) -> str | None:
+    """ratingKey of the movie or show a Plex webhook refers to, or None if it doesn't affect the report"""
+    if payload.get("event") != "library.new":
+        return None
+    metadata = payload.get("Metadata") or {}
+    # Episodes and seasons are folded into their show
+    if metadata.get("type") == "episode":
+        return metadata.get("grandparentRatingKey")
+    if metadata.get("type") == "season":
+        return metadata.get("parentRatingKey")
+    if metadata.get("type") in ("movie", "show"):
+        return metadata.get("ratingKey")
+    return None
+
+def handle_event(state: ReconcileState, source: str, payload: dict):
+    """Apply one queued webhook event to the state"""
+    if source == "resync":
+        state.resync()
+        return
+
+    if source == "plex":
+        rating_key = plex_event_key(payload)
+        if rating_key:
+            state.apply_plex_item(str(rating_key))
+    elif source == "radarr":
+        movie_id = (payload.get("movie") or {}).get("id")
+        if movie_id is None:
+            return
+        if payload.get("eventType") == "MovieDelete":
+            item = None
+        else:
+            item = fetch_arr_item(PVAC.RADARR_URL, PVAC.RADARR_API_KEY, "movie", movie_id, PVAC.radarr_item)
+        state.apply_arr_item(state.movies, movie_id, item)
+    elif source == "sonarr":
+        series_id = (payload.get("series") or {}).get("id")
+        if series_id is None:
+            return
+        if payload.get("eventType") == "SeriesDelete":
+            item = None
+        else:
+            item = fetch_arr_item(PVAC.SONARR_URL, PVAC.SONARR_API_KEY, "series", series_id, PVAC.sonarr_item)
+        state.apply_arr_item(state.shows, series_id, item)
+    else:
+        return
+
+    with state.lock:
+        state.events += 1
+
+def event_worker(state: ReconcileState, events: queue.Queue):
+    """Apply webhook events one at a time, rebuilding the report once the queue is drained"""
+    while True:
+        source, payload = events.get()
+        try:
+            handle_event(state, source, payload)
+            if events.empty():
+                state.report()
+        except Exception as e:
+            print(f"❌ Error handling {source} event: {str(e)}")
+        finally:
+            events.task_done()
+
+def resync_timer(events: queue.Queue, interval: float, stop: threading.Event):
+    while not stop.wait(interval):
+        events.put(("resync", None))
+
+# -----------------------------
+# HTTP LISTENER
+# -----------------------------
+def parse_plex_payload(content_type: str, body: bytes) -> dict:
+    """Plex posts multipart/form-data with the event JSON in a "payload" field"""
+    if not content_type.startswith("multipart/"):
+        return json.loads(body or b"{}")
+    message = BytesParser(policy=policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    for part in message.iter_parts():
+        if part.get_param("name", header="content-disposition") == "payload":
+            return json.loads(part.get_content())
+    return {}
+
+def make_handler(state: ReconcileState, events: queue.Queue):
+    class ServiceHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status: int, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def authorized(self, query: dict) -> bool:
+            if WEBHOOK_TOKEN and query.get("token", [""])[0] != WEBHOOK_TOKEN:
+                self.send_json(403, {"error": "invalid token"})
+                return False
+            return True
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if not self.authorized(parse_qs(url.query)):
+                return
+            if url.path == "/health":
+                self.send_json(200, {"status": "ok", "synced": state.synced_at, "queued": events.qsize()})
+            elif url.path == "/report":
+                self.send_json(200, state.report())
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if not self.authorized(parse_qs(url.query)):
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                if url.path == "/webhook/plex":
+                    events.put(("plex", parse_plex_payload(self.headers.get("Content-Type", ""), body)))
+                elif url.path in ("/webhook/radarr", "/webhook/sonarr"):
+                    events.put((url.path.rsplit("/", 1)[1], json.loads(body or b"{}")))
+                elif url.path == "/resync":
+                    events.put(("resync", None))
+                else:
+                    self.send_json(404, {"error": "not found"})
+                    return
+            except ValueError as e:
+                self.send_json(400, {"error": f"invalid payload: {e}"})
+                return
+            # Events are applied by the worker thread so senders never wait on Plex or the ARRs
+            self.send_json(202, {"queued": events.qsize()})
+
+    return ServiceHandler
+
+# -----------------------------
+# MAIN FUNCTION
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep the PVAC report current from Plex/Radarr/Sonarr webhooks")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args(argv)
+
+    print(f"PVAC Service {VERSION} (https://github.com/netplexflix/scripts-for-plex)")
+    if PVAC.PAIRINGS:
+        print(f"⚠️ ARR_INSTANCES/PAIRINGS are not supported by the service; comparing {PLEX_MOVIE_SECTION} with "
+              f"RADARR_URL and {PLEX_SHOW_SECTION} with SONARR_URL")
+    state = ReconcileState()
+    events = queue.Queue()
+    stop = threading.Event()
+    try:
+        state.resync()
+        state.report()
+
+        threading.Thread(target=event_worker, args=(state, events), daemon=True).start()
+        threading.Thread(target=resync_timer, args=(events, RESYNC_INTERVAL_HOURS * 3600, stop), daemon=True).start()
+
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(state, events))
+        print(f"🌐 Listening on http://{args.host}:{server.server_address[1]} "
+              f"(webhooks: /webhook/plex, /webhook/radarr, /webhook/sonarr; report: /report)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Stopping")
+        finally:
+            server.server_close()
+    except Exception as e:
+        print(f"❌ Error occurred: {str(e)}")
+        raise
+    finally:
+        stop.set()
+        PVAC.ID_CACHE.close()
+
+if __name__ == "__main__":
+    main()
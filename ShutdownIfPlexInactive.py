@@ -0,0 +1,274 @@
+import argparse
+import json
+import platform
+import subprocess
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+import requests
+
+VERSION = 1.0
+
+# -----------------------------
+# CONFIGURATION
+# -----------------------------
+PLEX_URL = 'http://localhost:32400'
+PLEX_TOKEN = 'your_plex_token'
+
+GRACE_PERIOD = 600               # Seconds without any Plex session before the idle actions run
+POLL_MIN = 15                    # Shortest /status/sessions poll interval, used right after a change
+POLL_MAX = 900                   # Longest poll interval, reached by backing off while nothing changes
+EVENT_READ_TIMEOUT = 120         # Plex pings the event stream regularly; a silent stream this long is reconnected
+EVENT_RECONNECT_MAX = 300        # Longest wait between event stream reconnects
+IDLE_ACTIONS = ["close_qbittorrent", "shutdown"]  # Run in this order once the grace period has passed
+EXIT_AFTER_ACTIONS = True        # Stop watching after the idle actions ran; otherwise wait for the next idle period
+
+# Idle action settings
+QBITTORRENT_URL = 'http://localhost:8080'
+QBITTORRENT_USERNAME = 'admin'
+QBITTORRENT_PASSWORD = 'adminadmin'
+IDLE_COMMAND = []                # Used by the "command" action, e.g. ["systemctl", "suspend"]
+SHUTDOWN_COMMAND = ["shutdown", "/s", "/f", "/t", "60"] if platform.system() == "Windows" else ["shutdown", "-h", "+1"]
+
+# -----------------------------
+# IDLE ACTIONS
+# -----------------------------
+ACTIONS = {}
+
+def idle_action(name: str):
+    """Register a function as an idle action, run by name from IDLE_ACTIONS"""
+    def register(action):
+        ACTIONS[name] = action
+        return action
+    return register
+
+@idle_action("close_qbittorrent")
+def close_qbittorrent():
+    """Ask qBittorrent to quit through its Web UI API"""
+    http = requests.Session()
+    resp = http.post(f"{QBITTORRENT_URL}/api/v2/auth/login",
+                     data={"username": QBITTORRENT_USERNAME, "password": QBITTORRENT_PASSWORD}, timeout=30)
+    resp.raise_for_status()
+    http.post(f"{QBITTORRENT_URL}/api/v2/app/shutdown", timeout=30).raise_for_status()
+
+@idle_action("command")
+def run_idle_command():
+    """Run IDLE_COMMAND"""
+    if IDLE_COMMAND:
+        subprocess.run(IDLE_COMMAND, check=True)
+
+@idle_action("shutdown")
+def shutdown():
+    """Shut the computer down after a one minute warning"""
+    subprocess.run(SHUTDOWN_COMMAND, check=True)
+
+def run_idle_actions(names, dry_run: bool = False):
+    for name in names:
+        if dry_run:
+            print(f"🧪 Would run idle action: {name}")
+            continue
+        try:
+            ACTIONS[name]()
+            print(f"✅ Idle action done: {name}")
+        except Exception as e:
+            print(f"❌ Idle action {name} failed: {e}")
+
+# -----------------------------
+# SESSION TRACKING
+# -----------------------------
+class SessionTracker:
+    """Active Plex sessions, kept current by the event stream and by polls; `changed` is set on every change"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.sessions = set()
+        self.idle_since = time.monotonic()
+        self.resync = False
+
+    def _set(self, sessions: set) -> bool:
+        if sessions == self.sessions:
+            return False
+        self.sessions = sessions
+        if sessions:
+            self.idle_since = None
+        elif self.idle_since is None:
+            self.idle_since = time.monotonic()
+        self.changed.set()
+        return True
+
+    def replace(self, sessions) -> bool:
+        """Take the session keys from a poll as the truth; returns whether anything changed"""
+        with self.lock:
+            return self._set(set(sessions))
+
+    def apply_notification(self, payload: dict):
+        """Apply the PlaySessionStateNotification entries of a Plex "playing" event"""
+        container = payload.get("NotificationContainer", {})
+        with self.lock:
+            sessions = set(self.sessions)
+            for notification in container.get("PlaySessionStateNotification", []):
+                key = str(notification.get("sessionKey"))
+                if notification.get("state") == "stopped":
+                    sessions.discard(key)
+                else:
+                    sessions.add(key)
+            self._set(sessions)
+
+    def stream_connected(self):
+        """Events may have been missed while the stream was down, so ask the watcher for a poll"""
+        with self.lock:
+            self.resync = True
+        self.changed.set()
+
+    def take_resync(self) -> bool:
+        with self.lock:
+            resync, self.resync = self.resync, False
+            return resync
+
+    def idle_for(self) -> float | None:
+        """Seconds since the last session ended, or None while something is playing"""
+        with self.lock:
+            return None if self.idle_since is None else time.monotonic() - self.idle_since
+
+    def restart_idle(self):
+        with self.lock:
+            if self.idle_since is not None:
+                self.idle_since = time.monotonic()
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self.sessions)
+
+def fetch_sessions(http) -> set:
+    """Poll /status/sessions for the keys of every active session"""
+    resp = http.get(f"{PLEX_URL}/status/sessions", params={"X-Plex-Token": PLEX_TOKEN}, timeout=30)
+    resp.raise_for_status()
+    root = ET.fromstring(resp.content)
+    return {elem.attrib.get("sessionKey") or elem.attrib.get("key") for elem in root}
+
+def iter_events(resp):
+    """Yield (event, data) pairs from a server-sent event stream"""
+    event, data = None, []
+    # chunk_size=1 so every event is handled as soon as it arrives instead of when a buffer fills up
+    for line in resp.iter_lines(chunk_size=1):
+        line = line.decode("utf-8")  # event streams are always UTF-8
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = None, []
+        elif not line.startswith(":"):
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+
+def watch_events(tracker: SessionTracker, stop: threading.Event):
+    """Follow Plex's notification event stream, reconnecting with backoff (runs in its own thread)"""
+    http = requests.Session()
+    delay = 1
+    while not stop.is_set():
+        try:
+            with http.get(f"{PLEX_URL}/:/eventsource/notifications",
+                          params={"filters": "playing", "X-Plex-Token": PLEX_TOKEN},
+                          stream=True, timeout=(10, EVENT_READ_TIMEOUT)) as resp:
+                resp.raise_for_status()
+                print("📡 Following Plex session events")
+                tracker.stream_connected()
+                delay = 1
+                for event, data in iter_events(resp):
+                    if stop.is_set():
+                        return
+                    if event == "playing":
+                        tracker.apply_notification(json.loads(data))
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️ Plex event stream unavailable, polling until it is back: {e}")
+        stop.wait(delay)
+        delay = min(delay * 2, EVENT_RECONNECT_MAX)
+
+# -----------------------------
+# WATCHER
+# -----------------------------
+def next_wait(interval: float, idle_for: float | None) -> float:
+    """Seconds until the next poll: the backed off interval, shortened to land on the idle deadline"""
+    if idle_for is None:
+        return interval
+    return max(0.0, min(interval, GRACE_PERIOD - idle_for))
+
+def watch(actions=None, dry_run: bool = False, stop: threading.Event | None = None):
+    """Watch Plex until it has been idle for GRACE_PERIOD seconds, then run the idle actions"""
+    actions = IDLE_ACTIONS if actions is None else actions
+    stop = stop or threading.Event()
+    tracker = SessionTracker()
+    threading.Thread(target=watch_events, args=(tracker, stop), daemon=True).start()
+    http = requests.Session()
+    interval = POLL_MIN
+    poll = True
+    last_count = None
+
+    while not stop.is_set():
+        # Polls back up the event stream and one must succeed before acting, so a session
+        # whose start event was dropped still holds off the idle actions
+        polled = False
+        if poll:
+            try:
+                changed = tracker.replace(fetch_sessions(http))
+                polled = True
+                interval = POLL_MIN if changed else min(interval * 2, POLL_MAX)
+            except (requests.RequestException, ET.ParseError) as e:
+                print(f"⚠️ Could not poll Plex sessions: {e}")
+                interval = POLL_MIN
+
+        count = tracker.count()
+        if count != last_count:
+            last_count = count
+            print(f"▶️ Plex is streaming ({count} sessions)" if count else
+                  f"💤 Plex is not streaming, idle actions run after {GRACE_PERIOD}s without a session")
+
+        idle_for = tracker.idle_for()
+        if polled and idle_for is not None and idle_for >= GRACE_PERIOD:
+            print(f"⏹️ Plex idle for {int(idle_for)}s, running idle actions: {', '.join(actions)}")
+            run_idle_actions(actions, dry_run)
+            if EXIT_AFTER_ACTIONS:
+                break
+            tracker.restart_idle()
+            continue
+
+        # A failed poll is retried after POLL_MIN rather than straight away at the deadline
+        woke = tracker.changed.wait(POLL_MIN if poll and not polled else next_wait(interval, idle_for))
+        tracker.changed.clear()
+        if woke:
+            interval = POLL_MIN
+        poll = not woke or tracker.take_resync()
+    stop.set()
+
+# -----------------------------
+# MAIN FUNCTION
+# -----------------------------
+def main(argv=None):
+    global GRACE_PERIOD
+    parser = argparse.ArgumentParser(description="Run idle actions (e.g. shut down) once Plex has stopped streaming")
+    parser.add_argument("--grace", type=int, default=GRACE_PERIOD,
+                        help="seconds without any Plex session before the idle actions run")
+    parser.add_argument("--actions", help="comma separated idle actions to run (default: IDLE_ACTIONS)")
+    parser.add_argument("--dry-run", action="store_true", help="report the idle actions instead of running them")
+    parser.add_argument("--list-actions", action="store_true", help="list the available idle actions and exit")
+    args = parser.parse_args(argv)
+
+    if args.list_actions:
+        for name, action in ACTIONS.items():
+            print(f"{name}: {action.__doc__}")
+        return
+
+    actions = args.actions.split(",") if args.actions else IDLE_ACTIONS
+    unknown = [name for name in actions if name not in ACTIONS]
+    if unknown:
+        parser.error(f"unknown idle action(s): {', '.join(unknown)}")
+    GRACE_PERIOD = args.grace
+    watch(actions, args.dry_run)
+
+if __name__ == "__main__":
+    main()
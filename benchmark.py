@@ -0,0 +1,864 @@
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import quoteattr
+
+VERSION = 1.0
+
+# -----------------------------
+# CONFIGURATION
+# -----------------------------
+# Synthetic library shape (all overridable on the command line)
+DEFAULT_SIZES = [1000, 10000]    # Plex movies per run; 1k to 200k are supported
+SHOW_RATIO = 0.25                # TV shows generated per movie
+MISSING_GUID_RATIO = 0.10        # Plex items without their primary (TMDb/TVDb) GUID
+DUPLICATE_RATIO = 0.02           # Plex items present twice in the library
+PERTURB_RATIO = 0.05             # Plex items whose title and ID drift from the ARR entry
+PLEX_ONLY_RATIO = 0.02           # Items only in Plex (half of them need a remote ID lookup)
+ARR_ONLY_RATIO = 0.02            # Items only in Radarr/Sonarr
+NO_GENRE_RATIO = 0.05            # Plex movies without genres (for noGenre.py)
+LATENCY_MS = 0                   # Delay added to every mock server response
+DIFF_REPEATS = 20                # ID diffs take milliseconds; repeat them so the timing rises above noise
+WATCHER_GRACE = 1.0              # Grace period for the ShutdownIfPlexInactive.py run, in seconds
+WATCHER_TIMEOUT = 30             # Give up on the watcher run if the idle actions haven't run by then
+WEBHOOK_ROUNDS = 25              # Rounds of webhooks posted to PVACService.py, 6 per round
+WEBHOOK_TIMEOUT = 120            # Give up if the service hasn't applied every webhook by then
+SERVICE_CHECK_EVENTS = 300       # Random library changes applied to PVACService.py and checked against a full rebuild
+SERVICE_CHECK_SAMPLE = 150       # ARR items per section the check starts from, with the Plex items resolving to them
+SEED = 1
+
+# Regression comparison against a stored baseline
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+REGRESSION_TOLERANCE = 0.20      # Relative slowdown / memory growth tolerated before flagging
+REGRESSION_MIN_SECONDS = 0.10    # Slowdowns smaller than this are treated as noise
+
+# -----------------------------
+# SYNTHETIC LIBRARY
+# -----------------------------
+_SYLLABLES = ["ka", "lo", "mi", "ra", "ten", "vor", "shi", "an", "el", "dus", "gar", "pe", "zu", "nor", "bri",
+              "qua", "lis", "ton", "mar", "ix"]
+_GENRES = ["Action", "Comedy", "Drama", "Horror", "Thriller", "Documentary", "Animation", "Romance"]
+_RESOLUTIONS = [("720", "h264"), ("1080", "h264"), ("1080", "hevc"), ("4k", "hevc")]
+_OVERVIEW = "A synthetic overview of roughly the length Radarr and Sonarr return for a real title. " * 3
+
+def _perturb(rng: random.Random, title: str) -> str:
+    """Small edit of a title: a typo, a dropped character or punctuation, like real metadata drift"""
+    choice = rng.random()
+    i = rng.randrange(len(title))
+    if choice < 0.3:
+        return title[:i] + rng.choice("aeiou") + title[i + 1:]
+    if choice < 0.6 and len(title) > 4:
+        return title[:i] + title[i + 1:]
+    if choice < 0.8:
+        return title.replace(" ", ": ", 1) if " " in title else title + "!"
+    return "The " + title
+
+def generate_library(size: int, options: dict) -> dict:
+    """Build a reproducible synthetic Plex/Radarr/Sonarr library with `size` Plex movies"""
+    rng = random.Random(options["seed"] + size)
+    words = sorted({"".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 3))).capitalize()
+                    for _ in range(4000)})
+
+    def title():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+
+    # Separate streams for media details and episodes, so the rest of the library doesn't depend on them
+    media_rng = random.Random(options["seed"] + size + 1)
+    episode_rng = random.Random(options["seed"] + size + 2)
+    now = int(time.time())
+    library = {"movies": [], "shows": [], "radarr": [], "sonarr": [], "sonarr_episodes": {}, "imdb_to_tmdb": {},
+               "imdb_to_tvdb": {}}
+
+    def add_plex(kind, item, guids, genres, episodes=()):
+        media = []
+        if kind == "movies":
+            resolution, codec = media_rng.choice(_RESOLUTIONS)
+            media.append((f"/movies/{item['title']} ({item['year']})/{item['title']} {resolution}.mkv",
+                          media_rng.randint(700, 60000) * 1024 * 1024, resolution, codec))
+        library[kind].append({"title": item["title"], "year": item.get("year"), "guids": guids, "genres": genres,
+                              "media": media, "episodes": episodes,
+                              "updatedAt": now - rng.randint(86400, 86400 * 365)})
+
+    for kind, count, id_name in (("movies", size, "tmdb"), ("shows", int(size * options["show_ratio"]), "tvdb")):
+        arr = library["radarr" if kind == "movies" else "sonarr"]
+        lookup = library["imdb_to_tmdb" if kind == "movies" else "imdb_to_tvdb"]
+        for i in range(count):
+            item = {"title": title(), "year": rng.randint(1950, 2026), "id": 100000 + i, "imdb": f"tt{2000000 + i}"}
+            episodes = []
+            if kind == "shows":
+                episodes = [(season, episode) for season in range(1, episode_rng.randint(1, 3) + 1)
+                            for episode in range(1, episode_rng.randint(4, 12) + 1)]
+            roll = rng.random()
+            if roll < options["arr_only"]:
+                in_plex, in_arr = False, True
+            elif roll < options["arr_only"] + options["plex_only"]:
+                in_plex, in_arr = True, False
+            else:
+                in_plex, in_arr = True, True
+
+            if in_arr:
+                entry = {"title": item["title"], "year": item["year"], "id": i + 1, f"{id_name}Id": item["id"],
+                         "imdbId": item["imdb"], "overview": _OVERVIEW, "monitored": True}
+                if kind == "movies":
+                    entry["hasFile"] = rng.random() > 0.02
+                else:
+                    entry["statistics"] = {"episodeFileCount": rng.randint(1, 200) if rng.random() > 0.02 else 0}
+                    with_files = entry["statistics"]["episodeFileCount"] > 0
+                    library["sonarr_episodes"][entry["id"]] = [
+                        {"seriesId": entry["id"], "seasonNumber": season, "episodeNumber": episode,
+                         "hasFile": with_files and episode_rng.random() > 0.05} for season, episode in episodes]
+                arr.append(entry)
+            if not in_plex:
+                continue
+
+            guids = [f"imdb://{item['imdb']}", f"{id_name}://{item['id']}"]
+            if not in_arr:
+                # Plex-only items: half carry only an IMDb GUID the catalog can't resolve, forcing a remote lookup
+                if rng.random() < 0.5:
+                    guids = [f"imdb://{item['imdb']}"]
+                    lookup[item["imdb"]] = item["id"]
+            elif rng.random() < options["perturb"]:
+                item = dict(item, title=_perturb(rng, item["title"]))
+                guids = [f"{id_name}://{item['id'] + 5000000}"]
+            elif rng.random() < options["missing_guid"]:
+                guids = [f"imdb://{item['imdb']}"] if rng.random() < 2 / 3 else []
+            genres = [] if kind == "movies" and rng.random() < options["no_genre"] else \
+                rng.sample(_GENRES, rng.randint(1, 3))
+            # Plex misses the odd episode Sonarr has, and has the odd one Sonarr doesn't know
+            episodes = [key for key in episodes if episode_rng.random() > 0.03]
+            if episodes and episode_rng.random() < 0.05:
+                episodes.append((episodes[-1][0], episodes[-1][1] + 1))
+            add_plex(kind, item, guids, genres, episodes)
+            if rng.random() < options["duplicates"]:
+                add_plex(kind, item, guids, genres, episodes)
+
+    return library
+
+# -----------------------------
+# MOCK SERVERS
+# -----------------------------
+def _item_xml(tag: str, kind: str, rating_key: int, item: dict) -> str:
+    year = f' year="{item["year"]}"' if item.get("year") else ""
+    children = "".join(f"<Guid id={quoteattr(guid)}/>" for guid in item["guids"])
+    children += "".join(f"<Genre tag={quoteattr(genre)}/>" for genre in item["genres"])
+    children += "".join(f'<Media videoResolution="{resolution}" videoCodec="{codec}">'
+                        f'<Part file={quoteattr(file)} size="{size}"/></Media>'
+                        for file, size, resolution, codec in item["media"])
+    return (f'<{tag} ratingKey="{rating_key}" key="/library/metadata/{rating_key}" type="{kind}" '
+            f'title={quoteattr(item["title"])}{year} updatedAt="{item["updatedAt"]}">{children}</{tag}>')
+
+def _episode_xml(rating_key: int, show_key: int, season: int, episode: int) -> str:
+    return (f'<Video ratingKey="{rating_key}" key="/library/metadata/{rating_key}" type="episode" '
+            f'title="Episode {episode}" grandparentRatingKey="{show_key}" parentIndex="{season}" index="{episode}"/>')
+
+class PlexActivity:
+    """Plex playback behind /status/sessions and the notification event stream, driven through /__bench/activity"""
+
+    def __init__(self):
+        self.changed = threading.Condition()
+        self.sessions = set()
+        self.events = []
+        self.generation = 0  # bumped to drop every open event stream
+        self.streams = 0
+
+    def control(self, command: dict) -> dict:
+        """Apply {"action": "start"/"stop", "session": key, "silent": bool} or {"action": "disconnect"}; returns the state"""
+        action = command.get("action")
+        with self.changed:
+            if action in ("start", "stop"):
+                key = str(command["session"])
+                if action == "start":
+                    self.sessions.add(key)
+                else:
+                    self.sessions.discard(key)
+                # Silent changes only show up in polls, like an event Plex never sent or one sent while disconnected
+                if not command.get("silent"):
+                    self.events.append({"NotificationContainer": {"type": "playing", "PlaySessionStateNotification": [
+                        {"sessionKey": key, "state": "playing" if action == "start" else "stopped"}]}})
+            elif action == "disconnect":
+                self.generation += 1
+            self.changed.notify_all()
+            return {"sessions": sorted(self.sessions), "streams": self.streams}
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Plex, Radarr (/radarr/api/v3) and Sonarr (/sonarr/api/v3) stand-ins over one synthetic library"""
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this small responses wait on the client's delayed ACK
+    disable_nagle_algorithm = True
+    library = None
+    activity = None
+    latency = 0.0
+    counts = {}
+    counts_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type: str, status: int = 200):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_found(self):
+        self.send_body(b"", "text/plain", 404)
+
+    def stream_events(self):
+        """Serve the notification event stream until the client goes away or a disconnect is requested"""
+        activity = self.activity
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        with activity.changed:
+            activity.streams += 1
+            generation, sent = activity.generation, len(activity.events)
+        try:
+            while True:
+                with activity.changed:
+                    activity.changed.wait_for(lambda: activity.generation != generation or len(activity.events) > sent,
+                                              timeout=1)
+                    if activity.generation != generation:
+                        return
+                    events, sent = activity.events[sent:], len(activity.events)
+                chunk = "".join(f"event: playing\ndata: {json.dumps(event)}\n\n" for event in events)
+                self.wfile.write((chunk or ": ping\n\n").encode())
+                self.wfile.flush()
+        except OSError:
+            return
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        command = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if path == "/__bench/activity":
+            return self.send_body(json.dumps(self.activity.control(command)), "application/json")
+        if path == "/__bench/library":
+            return self.send_body(json.dumps(self.edit_library(command)), "application/json")
+        return self.not_found()
+
+    def edit_library(self, command: dict) -> dict:
+        """Change one item: {"plex": ratingKey, "section": title, "xml": element or None} or {"radarr"/"sonarr": id,
+        "item": resource or None}.
+
+        Edits show up in /library/metadata/<key> and the single Radarr/Sonarr item endpoints, which is all a
+        webhook-driven update reads; section listings and full catalogs keep the generated library.
+        """
+        lib = self.library
+        if "plex" in command:
+            lib["plex_edits"][int(command["plex"])] = (command["section"], command["xml"])
+        for name in ("radarr", "sonarr"):
+            if name in command:
+                items = lib[f"{name}_by_id"]
+                if command["item"] is None:
+                    items.pop(int(command[name]), None)
+                else:
+                    items[int(command[name])] = json.dumps(command["item"]).encode()
+        return {}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if path == "/__bench/stats":
+            with self.counts_lock:
+                return self.send_body(json.dumps(self.counts), "application/json")
+
+        # Count per endpoint, folding IDs in the path so e.g. every /library/metadata/<key> is one bucket
+        endpoint = "/".join("{id}" if part.isdigit() else part for part in path.split("/"))
+        with self.counts_lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        lib = self.library
+        if path == "/":
+            return self.send_body('<MediaContainer size="0" friendlyName="benchmark" machineIdentifier="bench" '
+                                  'version="1.40.0.0"/>', "text/xml")
+        if path == "/library":
+            return self.send_body('<MediaContainer size="0" title1="Plex Library"/>', "text/xml")
+        if path == "/status/sessions":
+            with self.activity.changed:
+                sessions = sorted(self.activity.sessions)
+            return self.send_body(f'<MediaContainer size="{len(sessions)}">'
+                                  f'{"".join(f"<Video sessionKey={quoteattr(key)}/>" for key in sessions)}'
+                                  '</MediaContainer>', "text/xml")
+        if path == "/:/eventsource/notifications":
+            return self.stream_events()
+        if path == "/library/sections":
+            return self.send_body('<MediaContainer size="2">'
+                                  '<Directory key="1" type="movie" title="Movies" agent="a" scanner="s"/>'
+                                  '<Directory key="2" type="show" title="TV Shows" agent="a" scanner="s"/>'
+                                  '</MediaContainer>', "text/xml")
+        if path in ("/library/sections/1/all", "/library/sections/2/all"):
+            key = path.split("/")[3]
+            items = lib["movie_xml"] if key == "1" else lib["show_xml"]
+            plex_items = lib["movies"] if key == "1" else lib["shows"]
+            if key == "2" and query.get("type") == "4":
+                items = lib["episode_xml"]
+            elif "updatedAt>>" in query:
+                since = int(query["updatedAt>>"])
+                items = [xml for xml, item in zip(items, plex_items) if item["updatedAt"] >= since]
+            elif query.get("unmatched") == "1":
+                items = [xml for xml, item in zip(items, plex_items) if not item["guids"]]
+            start = int(query.get("X-Plex-Container-Start", 0))
+            size = int(query.get("X-Plex-Container-Size", len(items)))
+            page = items[start:start + size]
+            return self.send_body(f'<MediaContainer size="{len(page)}" totalSize="{len(items)}">'
+                                  f'{"".join(page)}</MediaContainer>', "text/xml")
+        if path.startswith("/library/metadata/"):
+            rating_key = int(path.split("/")[3])
+            if rating_key in lib["plex_edits"]:
+                section, xml = lib["plex_edits"][rating_key]
+                if xml is None:
+                    return self.not_found()
+                return self.send_body(f'<MediaContainer size="1" librarySectionTitle="{section}">{xml}</MediaContainer>',
+                                      "text/xml")
+            for xml_items, section in ((lib["movie_xml"], "Movies"), (lib["show_xml"], "TV Shows")):
+                index = rating_key - (1 if section == "Movies" else 10000001)
+                if 0 <= index < len(xml_items):
+                    return self.send_body(f'<MediaContainer size="1" librarySectionTitle="{section}">'
+                                          f'{xml_items[index]}</MediaContainer>', "text/xml")
+            return self.not_found()
+
+        if path == "/radarr/api/v3/movie":
+            return self.send_body(lib["radarr_json"], "application/json")
+        if path.startswith(("/radarr/api/v3/movie/", "/sonarr/api/v3/series/")) and path.rsplit("/", 1)[1].isdigit():
+            items = lib["radarr_by_id"] if path.startswith("/radarr/") else lib["sonarr_by_id"]
+            item = items.get(int(path.rsplit("/", 1)[1]))
+            return self.send_body(item, "application/json") if item else self.not_found()
+        if path == "/radarr/api/v3/movie/lookup/imdb":
+            tmdb_id = lib["imdb_to_tmdb"].get(query.get("imdbId"))
+            return self.send_body(json.dumps({"tmdbId": tmdb_id} if tmdb_id else {}), "application/json")
+        if path == "/radarr/api/v3/movie/lookup/tvdb":
+            return self.send_body("{}", "application/json")
+        if path == "/sonarr/api/v3/series":
+            return self.send_body(lib["sonarr_json"], "application/json")
+        if path == "/sonarr/api/v3/series/lookup":
+            tvdb_id = lib["imdb_to_tvdb"].get(query.get("term", "").replace("imdb:", ""))
+            return self.send_body(json.dumps([{"tvdbId": tvdb_id}] if tvdb_id else []), "application/json")
+        if path == "/sonarr/api/v3/episode":
+            episodes = lib["sonarr_episodes"].get(int(query.get("seriesId", 0)), [])
+            return self.send_body(json.dumps(episodes), "application/json")
+        return self.not_found()
+
+def serve_mock(size: int, options: dict, ready, stop):
+    """Generate the library and serve it until `stop` is set (runs in its own process)"""
+    library = generate_library(size, options)
+    # Rating keys: movies 1..N, shows 10000001.., episodes 20000001..; pre-render the XML so serving cost stays out of the numbers
+    library["movie_xml"] = [_item_xml("Video", "movie", i + 1, item) for i, item in enumerate(library["movies"])]
+    library["show_xml"] = [_item_xml("Directory", "show", i + 10000001, item)
+                           for i, item in enumerate(library["shows"])]
+    library["episode_xml"] = []
+    for i, item in enumerate(library["shows"]):
+        for season, episode in item["episodes"]:
+            library["episode_xml"].append(_episode_xml(len(library["episode_xml"]) + 20000001, i + 10000001,
+                                                       season, episode))
+    library["radarr_json"] = json.dumps(library["radarr"]).encode()
+    library["sonarr_json"] = json.dumps(library["sonarr"]).encode()
+    library["radarr_by_id"] = {movie["id"]: json.dumps(movie).encode() for movie in library["radarr"]}
+    library["sonarr_by_id"] = {series["id"]: json.dumps(series).encode() for series in library["sonarr"]}
+    library["plex_edits"] = {}
+    MockHandler.library = library
+    MockHandler.activity = PlexActivity()
+    MockHandler.latency = options["latency_ms"] / 1000
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ready.put({"port": server.server_address[1], "plex_movies": len(library["movies"]),
+               "plex_shows": len(library["shows"]), "radarr": len(library["radarr"]),
+               "sonarr": len(library["sonarr"])})
+    stop.wait()
+    server.shutdown()
+
+# -----------------------------
+# BENCHMARK RUN
+# -----------------------------
+def map_footprint_mb(ids, id_to_title: dict) -> float:
+    """Memory held by an ID set and its {id: title} map, counting shared IDs once"""
+    size = sys.getsizeof(ids) + sys.getsizeof(id_to_title)
+    size += sum(sys.getsizeof(id) for id in ids | id_to_title.keys())
+    size += sum(sys.getsizeof(title) for title in id_to_title.values())
+    return round(size / (1024 * 1024), 2)
+
+def watch_idle(base_url: str) -> float:
+    """Run ShutdownIfPlexInactive.py through a scripted evening; returns seconds from the last stop to the idle actions.
+
+    A session plays when the watcher starts and stops; a second one starts within the grace period; then the event
+    stream drops and the second session ends silently, so only a poll or the reconnect resync can notice.
+    """
+    import requests
+    import ShutdownIfPlexInactive as watcher
+
+    watcher.PLEX_URL, watcher.PLEX_TOKEN = base_url, "benchmark"
+    watcher.GRACE_PERIOD, watcher.POLL_MIN, watcher.POLL_MAX = WATCHER_GRACE, 0.2, 2
+
+    def activity(action, **command):
+        return requests.post(f"{base_url}/__bench/activity", json=dict(command, action=action), timeout=30).json()
+
+    stop = threading.Event()
+    last_stop = []
+
+    def play(streams):
+        while activity("state")["streams"] == streams and not stop.wait(0.05):
+            pass
+        time.sleep(0.2)
+        activity("stop", session=1)
+        time.sleep(WATCHER_GRACE / 2)
+        activity("start", session=2)
+        time.sleep(0.2)
+        activity("disconnect")
+        activity("stop", session=2, silent=True)
+        last_stop.append(time.perf_counter())
+
+    streams = activity("start", session=1, silent=True)["streams"]
+    threading.Thread(target=play, args=(streams,), daemon=True).start()
+    started = time.perf_counter()
+    timeout = threading.Timer(WATCHER_TIMEOUT, stop.set)
+    timeout.start()
+    log = io.StringIO()
+    with redirect_stdout(log):
+        watcher.watch(["command"], dry_run=True, stop=stop)
+    ran = time.perf_counter()
+    timeout.cancel()
+    activity("disconnect")
+    if ran - started >= WATCHER_TIMEOUT or "Would run idle action: command" not in log.getvalue():
+        raise RuntimeError(f"watcher didn't run the idle actions within {WATCHER_TIMEOUT}s:\n{log.getvalue()}")
+    if not last_stop:
+        raise RuntimeError(f"watcher ran the idle actions while Plex was streaming:\n{log.getvalue()}")
+    return ran - last_stop[0]
+
+def service_webhooks(state, rounds: int) -> list:
+    """(path, payload) webhooks as Radarr, Sonarr and Plex send them.
+
+    Every round deletes and re-downloads one movie and one series, and has Plex announce an existing movie and a
+    new episode of an existing show, so once all are applied the report must match the one before.
+    """
+    movie_keys, show_keys = sorted(state.movies.entries, key=int), sorted(state.shows.entries, key=int)
+    radarr_ids, sonarr_ids = sorted(state.movies.arr_items), sorted(state.shows.arr_items)
+    webhooks = []
+    for i in range(rounds):
+        movie_id, series_id = radarr_ids[i * len(radarr_ids) // rounds], sonarr_ids[i * len(sonarr_ids) // rounds]
+        movie_key, show_key = movie_keys[i * len(movie_keys) // rounds], show_keys[i * len(show_keys) // rounds]
+        webhooks += [
+            ("/webhook/radarr", {"eventType": "MovieDelete", "movie": {"id": movie_id}}),
+            ("/webhook/radarr", {"eventType": "Download", "movie": {"id": movie_id}}),
+            ("/webhook/sonarr", {"eventType": "SeriesDelete", "series": {"id": series_id}}),
+            ("/webhook/sonarr", {"eventType": "Download", "series": {"id": series_id}}),
+            ("/webhook/plex", {"event": "library.new", "Metadata": {"type": "movie", "ratingKey": movie_key}}),
+            ("/webhook/plex", {"event": "library.new",
+                               "Metadata": {"type": "episode", "grandparentRatingKey": show_key}}),
+        ]
+    return webhooks
+
+def replay_webhooks(state, webhooks: list) -> dict:
+    """Post webhooks to a PVACService.py listener and wait until the worker applied every one; returns the report"""
+    import requests
+    import PVACService as service
+
+    events = queue.Queue()
+    threading.Thread(target=service.event_worker, args=(state, events), daemon=True).start()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), service.make_handler(state, events))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    http = requests.Session()
+    expected = state.events + len(webhooks)
+    try:
+        for path, payload in webhooks:
+            if path == "/webhook/plex":
+                # Plex posts multipart/form-data with the event JSON in a "payload" field
+                resp = http.post(url + path, files={"payload": (None, json.dumps(payload), "application/json")},
+                                 timeout=30)
+            else:
+                resp = http.post(url + path, json=payload, timeout=30)
+            resp.raise_for_status()
+        deadline = time.perf_counter() + WEBHOOK_TIMEOUT
+        while True:
+            if http.get(f"{url}/health", timeout=30).json()["queued"] == 0:
+                report = http.get(f"{url}/report", timeout=30).json()
+                if report["events"] >= expected:
+                    return report
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"PVACService.py didn't apply {len(webhooks)} webhooks within {WEBHOOK_TIMEOUT}s")
+            time.sleep(0.01)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def check_service_events(state, base_url: str, count: int, seed: int) -> int:
+    """Apply random Plex, Radarr and Sonarr changes to PVACService.py one event at a time; returns the events after
+    which the section's report differed from a full rebuild of the same entries and ARR catalog.
+
+    The check runs on a slice of the synced state, so rebuilding after every event stays cheap at any library
+    size. Titles, years and IDs come from small pools and the same items are edited again and again, so changes
+    keep creating and breaking duplicates, shared IDs, title matches and remote lookups.
+    """
+    import requests
+    import PVACService as service
+
+    rng = random.Random(seed)
+    http = requests.Session()
+    now = int(time.time())
+    sample = service.ReconcileState()
+    sample.plex = state.connect()
+    sections, pools, edited = {}, {}, {}
+    for kind, synced in (("movie", state.movies), ("show", state.shows)):
+        arr_ids = sorted(rng.sample(sorted(synced.arr_items), min(SERVICE_CHECK_SAMPLE, len(synced.arr_items))))
+        ids = {synced.arr_items[arr_id].tmdb_id if kind == "movie" else synced.arr_items[arr_id].tvdb_id
+               for arr_id in arr_ids}
+        keys = [key for key, id in synced.resolved.items() if id in ids or id is None and rng.random() < 0.2]
+        section = service.build_section(kind, {key: synced.entries[key] for key in sorted(keys, key=int)},
+                                        {arr_id: synced.arr_items[arr_id] for arr_id in arr_ids})
+        setattr(sample, "movies" if kind == "movie" else "shows", section)
+        sections[kind] = section
+        items = [section.arr_items[arr_id] for arr_id in rng.sample(arr_ids, min(6, len(arr_ids)))]
+        pools[kind] = {
+            "titles": [item.title for item in items],
+            "ids": [item.tmdb_id if kind == "movie" else item.tvdb_id for item in items] + [9000001, 9000002],
+            "imdb": [item.imdb_id for item in items] + ["tt9000001"],
+        }
+        edited[kind] = {"plex": [], "arr": []}
+    next_key = {"movie": 30000001, "show": 40000001}
+    next_arr_id = max(list(state.movies.arr_items) + list(state.shows.arr_items)) + 1
+
+    def pick(kind, side, existing):
+        """An item edited before, another existing one, or None for a new one"""
+        roll = rng.random()
+        previous = [key for key in edited[kind][side] if key in existing]
+        if previous and roll < 0.5:
+            return rng.choice(previous)
+        if existing and roll < 0.7:
+            return rng.choice(sorted(existing, key=int))
+        return None
+
+    def edit(**command):
+        http.post(f"{base_url}/__bench/library", json=command, timeout=30).raise_for_status()
+
+    def plex_event(kind):
+        section, pool = sections[kind], pools[kind]
+        key = pick(kind, "plex", section.entries)
+        if key is None:
+            key, next_key[kind] = str(next_key[kind]), next_key[kind] + 1
+        edited[kind]["plex"].append(key)
+        title = "Movies" if kind == "movie" else "TV Shows"
+        if key in section.entries and rng.random() < 0.2:
+            edit(plex=key, section=title, xml=None)
+        else:
+            id_name = "tmdb" if kind == "movie" else "tvdb"
+            guids = rng.choice([[], [f"imdb://{rng.choice(pool['imdb'])}"], [f"{id_name}://{rng.choice(pool['ids'])}"],
+                                [f"imdb://{rng.choice(pool['imdb'])}", f"{id_name}://{rng.choice(pool['ids'])}"]])
+            media = []
+            if kind == "movie":
+                media = [(f"/movies/{key}/{version}.mkv", rng.randint(1, 40) * 1024 ** 3, "1080", "h264")
+                         for version in range(rng.choice([0, 1, 1, 2]))]
+            item = {"title": rng.choice(pool["titles"]), "year": rng.choice([None, 1999, 2005]), "guids": guids,
+                    "genres": [], "media": media, "updatedAt": now}
+            edit(plex=key, section=title, xml=_item_xml("Video" if kind == "movie" else "Directory", kind, key, item))
+        return {"event": "library.new", "Metadata": {"type": kind, "ratingKey": key}}
+
+    def arr_event(kind):
+        nonlocal next_arr_id
+        section, pool = sections[kind], pools[kind]
+        name, resource = ("radarr", "movie") if kind == "movie" else ("sonarr", "series")
+        id_field = "tmdbId" if kind == "movie" else "tvdbId"
+        arr_id = pick(kind, "arr", section.arr_items)
+        if arr_id is not None:
+            edited[kind]["arr"].append(arr_id)
+            if rng.random() < 0.3:
+                edit(**{name: arr_id, "item": None})
+                return {"eventType": "MovieDelete" if kind == "movie" else "SeriesDelete", resource: {"id": arr_id}}
+            current = section.arr_items[arr_id]
+            id = current.tmdb_id if kind == "movie" else current.tvdb_id
+            item = {"id": arr_id, "title": current.title, id_field: id, "imdbId": current.imdb_id}
+        else:
+            taken = {item.tmdb_id if kind == "movie" else item.tvdb_id for item in section.arr_items.values()}
+            id = rng.choice(pool["ids"])
+            if id in taken:
+                id = 8000000 + next_arr_id
+            arr_id, next_arr_id = next_arr_id, next_arr_id + 1
+            edited[kind]["arr"].append(arr_id)
+            item = {"id": arr_id, "title": rng.choice(pool["titles"]), id_field: id,
+                    "imdbId": rng.choice(pool["imdb"]) if rng.random() < 0.5 else None}
+        if kind == "movie":
+            item["hasFile"] = rng.random() < 0.8
+        else:
+            item["statistics"] = {"episodeFileCount": rng.choice([0, 3, 12])}
+        edit(**{name: arr_id, "item": item})
+        return {"eventType": "Download", resource: {"id": arr_id}}
+
+    mismatches = 0
+    for _ in range(count):
+        kind = rng.choice(("movie", "show"))
+        if rng.random() < 0.5:
+            service.handle_event(sample, "plex", plex_event(kind))
+        else:
+            service.handle_event(sample, "radarr" if kind == "movie" else "sonarr", arr_event(kind))
+        section = sections[kind]
+        id_name, arr = ("tmdbId", "radarr") if kind == "movie" else ("tvdbId", "sonarr")
+        report = sample.report()["movies" if kind == "movie" else "shows"]
+        rebuilt = service.build_section(kind, dict(section.entries), dict(sorted(section.arr_items.items())))
+        if json.dumps(report, sort_keys=True) != json.dumps(rebuilt.report({}, id_name, arr), sort_keys=True):
+            mismatches += 1
+    return mismatches
+
+def run_phases(base_url: str, trace_memory: bool, results):
+    """Run PVAC.py, PVACService.py, noGenre.py and metadataAudit.py phase by phase against the mock servers.
+
+    Runs in its own process.
+    """
+    import requests
+    import PVAC
+    import PVACService as service
+    import noGenre
+    import metadataAudit
+    from plexapi.server import PlexServer
+
+    PVAC.PLEX_URL, PVAC.PLEX_TOKEN = base_url, "benchmark"
+    PVAC.RADARR_URL, PVAC.SONARR_URL = f"{base_url}/radarr/api/v3", f"{base_url}/sonarr/api/v3"
+    noGenre.plex_url, noGenre.plex_token = base_url, "benchmark"
+    # Start from a cold, in-memory ID cache so every run does the same lookups
+    PVAC.ID_CACHE = PVAC.IDCache(None)
+
+    def requests_made():
+        return requests.get(f"{base_url}/__bench/stats", timeout=30).json()
+
+    phases = {}
+
+    def phase(name, fn, count=None):
+        before = requests_made()
+        if trace_memory:
+            tracemalloc.start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        with redirect_stdout(io.StringIO()):
+            result = fn()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        after = requests_made()
+        record = {
+            "wall": round(wall, 4),
+            "cpu": round(cpu, 4),
+            "requests": {k: v - before.get(k, 0) for k, v in after.items() if v != before.get(k, 0)},
+            "rss_mb": round(PVAC.peak_rss_mb() or 0, 1),
+        }
+        if trace_memory:
+            record["alloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+        if count is not None:
+            record["items"] = count(result)
+        phases[name] = record
+        return result
+
+    plex = PlexServer(base_url, "benchmark")
+    radarr = phase("radarr_fetch", PVAC.fetch_radarr_movies, lambda r: len(r[0]))
+    sonarr = phase("sonarr_fetch", PVAC.fetch_sonarr_tv_shows, lambda r: len(r[0]))
+    movie_entries = phase("plex_movie_scan", lambda: PVAC.scan_plex_movies(plex), len)
+    show_entries = phase("plex_show_scan", lambda: PVAC.scan_plex_tv_shows(plex), len)
+    phase("plex_movie_rescan_incremental",
+          lambda: PVAC.scan_plex_movies(plex, previous=movie_entries, since=int(time.time()) - 3600), len)
+    movies = phase("movie_id_resolve", lambda: PVAC.fetch_plex_movies(plex, radarr[2], movie_entries), lambda r: r[2])
+    shows = phase("show_id_resolve", lambda: PVAC.fetch_plex_tv_shows(plex, sonarr[2], show_entries), lambda r: r[2])
+    phase("duplicate_files",
+          lambda: PVAC.find_duplicate_files(movie_entries, PVAC.movie_tmdb_by_key(movie_entries, radarr[2])), len)
+    movie_stats = phase("movie_compare", lambda: PVAC.compare_movies(movies[0], movies[1], radarr[0], radarr[1], movies[3]))
+    show_stats = phase("show_compare", lambda: PVAC.compare_tv_shows(shows[0], shows[1], sonarr[0], sonarr[1], shows[3]))
+    plex_episodes = phase("plex_episode_scan", lambda: PVAC.scan_plex_episodes(plex), len)
+    tvdb_by_key = PVAC.show_tvdb_by_key(show_entries, sonarr[2])
+    tvdb_to_series = sonarr[2]["tvdb_to_series"]
+    series_to_tvdb = {tvdb_to_series[tvdb_id]: tvdb_id for tvdb_id in set(tvdb_by_key.values())
+                      if tvdb_id in tvdb_to_series}
+    sonarr_episodes, _ = phase("sonarr_episode_fetch", lambda: PVAC.fetch_sonarr_episodes(series_to_tvdb),
+                               lambda r: sum(len(episodes) for episodes in r[0].values()))
+    episode_stats = phase("episode_compare", lambda: PVAC.compare_episodes(
+        plex_episodes, tvdb_by_key, {series_to_tvdb[id]: episodes for id, episodes in sonarr_episodes.items()},
+        {**sonarr[1], **shows[1]}))
+    # Set/dict catalogs against the compact columnar ones, on the same movie data
+    phase("id_diff_sets", lambda: [(movies[0] - radarr[0], radarr[0] - movies[0]) for _ in range(DIFF_REPEATS)])
+    catalogs = phase("catalog_build", lambda: (PVAC.build_catalog(movies[1], movies[3], movies[4]),
+                                               PVAC.build_catalog(radarr[1])))
+    phase("id_diff_catalog", lambda: [(catalogs[0].difference(catalogs[1]), catalogs[1].difference(catalogs[0]))
+                                      for _ in range(DIFF_REPEATS)])
+    footprint = {
+        "sets_mb": round(map_footprint_mb(movies[0], movies[1]) + map_footprint_mb(radarr[0], radarr[1]), 2),
+        "catalog_mb": round((catalogs[0].nbytes + catalogs[1].nbytes) / (1024 * 1024), 2),
+        "numpy": PVAC.np is not None,
+    }
+    PVAC.ID_CACHE = PVAC.IDCache(None)
+    phase("pvac_end_to_end", lambda: PVAC.main([]))
+    PVAC.ID_CACHE = PVAC.IDCache(None)
+    phase("pvac_end_to_end_episodes", lambda: PVAC.main(["--episodes"]))
+    PVAC.ID_CACHE = PVAC.IDCache(None)
+    state = service.ReconcileState()
+    phase("service_resync", state.resync)
+    initial = phase("service_report", state.report)
+    initial = json.loads(json.dumps(initial))  # as /report returns it
+    webhooks = service_webhooks(state, WEBHOOK_ROUNDS)
+    report = phase("service_webhooks", lambda: replay_webhooks(state, webhooks), lambda r: r["events"])
+    if (report["movies"], report["shows"]) != (initial["movies"], initial["shows"]):
+        raise RuntimeError("PVACService.py report changed after webhooks that should leave it as it was")
+    phase("nogenre_scan", noGenre.find_movies_without_genre)
+    phase("metadata_audit", lambda: metadataAudit.run_audit(plex, list(metadataAudit.RULES.values())),
+          lambda r: sum(len(items) for items in r[0].values()))
+    # Runs after every phase that lists the library, since the edits it makes only reach the per-item endpoints
+    mismatches = phase("service_event_check", lambda: check_service_events(state, base_url, SERVICE_CHECK_EVENTS, SEED))
+    if mismatches:
+        raise RuntimeError(f"PVACService.py report differed from a full rebuild after {mismatches} of "
+                           f"{SERVICE_CHECK_EVENTS} events")
+
+    # Timed on its own: its wall time and poll count follow the grace period and scheduling, not the code under test
+    before = requests_made()
+    idle_after = watch_idle(base_url)
+    after = requests_made()
+    watcher = {"grace_s": WATCHER_GRACE, "idle_after_s": round(idle_after, 2),
+               "polls": after.get("/status/sessions", 0) - before.get("/status/sessions", 0),
+               "streams": after.get("/:/eventsource/notifications", 0) - before.get("/:/eventsource/notifications", 0)}
+
+    results.put({"phases": phases, "outcome": {"movies": movie_stats, "shows": show_stats, "episodes": episode_stats},
+                 "footprint": footprint, "watcher": watcher})
+
+def run_size(size: int, options: dict) -> dict:
+    """Benchmark one library size with a fresh mock server and client process"""
+    ctx = multiprocessing.get_context("spawn")
+    ready, results, stop = ctx.Queue(), ctx.Queue(), ctx.Event()
+    server = ctx.Process(target=serve_mock, args=(size, options, ready, stop), daemon=True)
+    server.start()
+    try:
+        library = ready.get(timeout=600)
+        client = ctx.Process(target=run_phases,
+                             args=(f"http://127.0.0.1:{library['port']}", options["trace_memory"], results))
+        client.start()
+        client.join()
+        if client.exitcode != 0:
+            raise RuntimeError(f"benchmark client exited with code {client.exitcode}")
+        run = results.get(timeout=10)
+    finally:
+        stop.set()
+        server.join(timeout=10)
+    del library["port"]
+    run["library"] = library
+    return run
+
+# -----------------------------
+# REPORTING
+# -----------------------------
+def compare_to_baseline(run: dict, base: dict | None) -> list:
+    """Return human readable regressions of `run` against the baseline run for the same size"""
+    if not base:
+        return []
+    regressions = []
+    for name, current in run["phases"].items():
+        previous = base["phases"].get(name)
+        if not previous:
+            continue
+        slower = current["wall"] - previous["wall"]
+        if slower > REGRESSION_MIN_SECONDS and current["wall"] > previous["wall"] * (1 + REGRESSION_TOLERANCE):
+            regressions.append(f"{name}: {previous['wall']:.3f}s -> {current['wall']:.3f}s")
+        current_requests, previous_requests = sum(current["requests"].values()), sum(previous["requests"].values())
+        if current_requests > previous_requests:
+            regressions.append(f"{name}: {previous_requests} -> {current_requests} HTTP requests")
+        for key in ("rss_mb", "alloc_peak_mb"):
+            if key in current and key in previous and current[key] > previous[key] * (1 + REGRESSION_TOLERANCE) + 1:
+                regressions.append(f"{name}: {key} {previous[key]} -> {current[key]}")
+    if run["outcome"] != base.get("outcome"):
+        regressions.append(f"results changed: {base.get('outcome')} -> {run['outcome']}")
+    return regressions
+
+def print_run(size: int, run: dict, base: dict | None):
+    library = run["library"]
+    print(f"\n📚 {size} movies: {library['plex_movies']} Plex movies, {library['plex_shows']} Plex TV shows, "
+          f"{library['radarr']} Radarr movies, {library['sonarr']} Sonarr TV shows")
+    print(f"{'phase':<32}{'wall s':>9}{'cpu s':>9}{'requests':>10}{'rss MB':>9}{'alloc MB':>10}{'vs base':>10}")
+    for name, record in run["phases"].items():
+        previous = (base or {}).get("phases", {}).get(name)
+        change = f"{(record['wall'] / previous['wall'] - 1) * 100:+.0f}%" if previous and previous["wall"] else ""
+        print(f"{name:<32}{record['wall']:>9.3f}{record['cpu']:>9.3f}{sum(record['requests'].values()):>10}"
+              f"{record['rss_mb']:>9.1f}{record.get('alloc_peak_mb', ''):>10}{change:>10}")
+    footprint = run.get("footprint")
+    if footprint:
+        print(f"🧮 Movie catalogs: {footprint['sets_mb']} MB as sets/dicts, {footprint['catalog_mb']} MB compact "
+              f"({'NumPy' if footprint['numpy'] else 'pure Python'} diffs)")
+    watcher = run.get("watcher")
+    if watcher:
+        print(f"💤 Idle watcher: actions ran {watcher['idle_after_s']}s after the last session ended "
+              f"(grace {watcher['grace_s']}s, {watcher['polls']} polls, {watcher['streams']} event stream connections)")
+
+# -----------------------------
+# MAIN FUNCTION
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PVAC.py and noGenre.py against synthetic mock servers")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated Plex movie counts, e.g. 1000,10000,200000")
+    parser.add_argument("--show-ratio", type=float, default=SHOW_RATIO)
+    parser.add_argument("--missing-guid", type=float, default=MISSING_GUID_RATIO)
+    parser.add_argument("--duplicates", type=float, default=DUPLICATE_RATIO)
+    parser.add_argument("--perturb", type=float, default=PERTURB_RATIO)
+    parser.add_argument("--plex-only", type=float, default=PLEX_ONLY_RATIO)
+    parser.add_argument("--arr-only", type=float, default=ARR_ONLY_RATIO)
+    parser.add_argument("--no-genre", type=float, default=NO_GENRE_RATIO)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS, help="delay added to every mock response")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also record per-phase peak Python allocations (slows the run down)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--output", help="write the results of this run as JSON")
+    args = parser.parse_args(argv)
+
+    options = {
+        "show_ratio": args.show_ratio, "missing_guid": args.missing_guid, "duplicates": args.duplicates,
+        "perturb": args.perturb, "plex_only": args.plex_only, "arr_only": args.arr_only,
+        "no_genre": args.no_genre, "latency_ms": args.latency_ms, "seed": args.seed,
+        "trace_memory": args.trace_memory,
+    }
+    print(f"PVAC Benchmark {VERSION} (https://github.com/netplexflix/scripts-for-plex)")
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("options") != options:
+            print("⚠️ Baseline was recorded with different options; comparison may not be meaningful")
+
+    runs = {}
+    regressions = []
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        run = run_size(size, options)
+        runs[str(size)] = run
+        base = (baseline or {}).get("runs", {}).get(str(size))
+        print_run(size, run, base)
+        regressions += [f"{size}: {r}" for r in compare_to_baseline(run, base)]
+
+    results = {"version": VERSION, "created": time.time(), "python": sys.version.split()[0],
+               "options": options, "runs": runs}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+
+    if baseline:
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions against the baseline:")
+            for regression in regressions:
+                print(f" - {regression}")
+            return 1
+        print("\n✅ No regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
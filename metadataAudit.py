@@ -0,0 +1,194 @@
+import argparse
+import time
+from urllib.parse import urlencode
+
+from plexapi.server import PlexServer
+
+VERSION = 1.0
+
+# -----------------------------
+# CONFIGURATION
+# -----------------------------
+PLEX_URL = 'http://localhost:32400'
+PLEX_TOKEN = 'your_plex_token'
+PAGE_SIZE = 500                        # Items requested from Plex at a time
+SECTIONS = []                          # Section titles to audit; empty audits every movie and TV show section
+ENABLED_RULES = []                     # Rule names to run; empty runs every rule
+LEADING_ARTICLES = ("the ", "a ", "an ")
+
+# -----------------------------
+# RULES
+# -----------------------------
+class Rule:
+    """An audit check: `check(elem)` returns True when a Plex listing element fails it"""
+    __slots__ = ("name", "description", "check", "kinds", "server_filter", "include_guids")
+
+    def __init__(self, name, description, check, kinds, server_filter, include_guids):
+        self.name = name
+        self.description = description
+        self.check = check
+        self.kinds = kinds
+        self.server_filter = server_filter
+        self.include_guids = include_guids
+
+RULES = {}
+
+def rule(name: str, description: str, kinds=("movie", "show"), server_filter: dict | None = None,
+         include_guids: bool = False):
+    """Register a check as an audit rule.
+
+    Rules with a server_filter get their own filtered listing, so only matching items come over the wire;
+    the check still runs on what comes back, so a server that ignores the filter only costs bandwidth.
+    All other rules share one streamed pass per section.
+    """
+    def register(check):
+        RULES[name] = Rule(name, description, check, kinds, server_filter, include_guids)
+        return check
+    return register
+
+def strip_article(title: str) -> str:
+    """Lowercase a title and drop a leading article, the way Plex builds sort titles"""
+    title = title.strip().lower()
+    for article in LEADING_ARTICLES:
+        if title.startswith(article):
+            return title[len(article):].lstrip()
+    return title
+
+@rule("missing_genre", "without genres")
+def missing_genre(elem) -> bool:
+    return elem.find('Genre') is None
+
+@rule("missing_poster", "without a poster")
+def missing_poster(elem) -> bool:
+    return not elem.attrib.get('thumb')
+
+@rule("missing_guids", "without IMDb/TMDb/TVDb IDs", include_guids=True)
+def missing_guids(elem) -> bool:
+    return elem.find('Guid') is None
+
+@rule("missing_year", "without a year")
+def missing_year(elem) -> bool:
+    return not elem.attrib.get('year')
+
+@rule("missing_summary", "without a summary")
+def missing_summary(elem) -> bool:
+    return not elem.attrib.get('summary', '').strip()
+
+@rule("sort_title_mismatch", "with a sort title that doesn't match the title")
+def sort_title_mismatch(elem) -> bool:
+    sort_title = elem.attrib.get('titleSort')
+    return bool(sort_title) and strip_article(sort_title) != strip_article(elem.attrib.get('title', ''))
+
+@rule("unmatched", "not matched to any agent", server_filter={'unmatched': 1})
+def unmatched(elem) -> bool:
+    guid = elem.attrib.get('guid', '')
+    return not guid or guid.startswith(('local://', 'com.plexapp.agents.none://'))
+
+# -----------------------------
+# AUDIT ENGINE
+# -----------------------------
+def iter_section_elements(plex, section, params: dict | None = None, page_size: int = PAGE_SIZE):
+    """Yield the raw listing element of every item in the section, one page at a time"""
+    start = 0
+    while True:
+        query = dict(params or {}, **{'X-Plex-Container-Start': start, 'X-Plex-Container-Size': page_size})
+        data = plex.query(f'/library/sections/{section.key}/all?{urlencode(query)}')
+        page = [elem for elem in data if elem.tag in ('Video', 'Directory')]
+        yield from page
+        start += len(page)
+        if not page or start >= int(data.attrib.get('totalSize', start)):
+            break
+
+def audit_item(section, elem) -> tuple:
+    return section.title, elem.attrib.get('title'), elem.attrib.get('year')
+
+def audit_section(plex, section, rules, results: dict, timings: dict) -> int:
+    """Run every rule that applies to the section's type, filling results and timings per rule; returns items scanned"""
+    active = [r for r in rules if section.type in r.kinds]
+    shared = [r for r in active if not r.server_filter]
+    scanned = 0
+
+    if shared:
+        params = {'includeGuids': 1} if any(r.include_guids for r in shared) else {}
+        for elem in iter_section_elements(plex, section, params):
+            scanned += 1
+            for r in shared:
+                start = time.perf_counter()
+                failed = r.check(elem)
+                timings[r.name] += time.perf_counter() - start
+                if failed:
+                    results[r.name].append(audit_item(section, elem))
+
+    for r in active:
+        if not r.server_filter:
+            continue
+        # Filtered rules are timed including their request, since that is where their cost is
+        start = time.perf_counter()
+        params = dict(r.server_filter, **({'includeGuids': 1} if r.include_guids else {}))
+        for elem in iter_section_elements(plex, section, params):
+            if r.check(elem):
+                results[r.name].append(audit_item(section, elem))
+        timings[r.name] += time.perf_counter() - start
+    return scanned
+
+def run_audit(plex, rules, section_titles=None) -> tuple:
+    """Audit the given (or every movie and TV show) section; returns ({rule: [(section, title, year)]}, {rule: seconds})"""
+    results = {r.name: [] for r in rules}
+    timings = {r.name: 0.0 for r in rules}
+    sections = [section for section in plex.library.sections() if section.type in ('movie', 'show')]
+    if section_titles:
+        sections = [section for section in sections if section.title in section_titles]
+    for section in sections:
+        print(f"\n🔍 Auditing {section.title}...")
+        start = time.perf_counter()
+        scanned = audit_section(plex, section, rules, results, timings)
+        print(f"   {scanned} items scanned in {time.perf_counter() - start:.2f}s")
+    return results, timings
+
+def print_results(rules, results: dict, timings: dict):
+    for r in rules:
+        items = results[r.name]
+        print("\n" + "="*50)
+        print(f"📋 Items {r.description} ({len(items)})")
+        print("="*50)
+        for section, title, year in sorted(items, key=lambda item: (item[0], str(item[1]).lower())):
+            print(f" - {title} ({year}) [{section}]" if year else f" - {title} [{section}]")
+
+    print("\n" + "="*50)
+    print("📊 SUMMARY")
+    print("="*50)
+    for r in rules:
+        print(f"{r.name}: {len(results[r.name])} items, {timings[r.name]:.3f}s")
+
+# -----------------------------
+# MAIN FUNCTION
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit Plex movie and TV show metadata with many rules in one pass")
+    parser.add_argument("--rules", help="comma separated rule names to run (default: ENABLED_RULES, or all)")
+    parser.add_argument("--sections", help="comma separated section titles to audit (default: SECTIONS, or all)")
+    parser.add_argument("--list-rules", action="store_true", help="list the available rules and exit")
+    args = parser.parse_args(argv)
+
+    if args.list_rules:
+        for r in RULES.values():
+            print(f"{r.name}: items {r.description} ({', '.join(r.kinds)})")
+        return
+
+    names = args.rules.split(",") if args.rules else ENABLED_RULES or list(RULES)
+    unknown = [name for name in names if name not in RULES]
+    if unknown:
+        parser.error(f"unknown rule(s): {', '.join(unknown)}")
+    rules = [RULES[name] for name in names]
+    section_titles = args.sections.split(",") if args.sections else SECTIONS
+
+    try:
+        plex = PlexServer(PLEX_URL, PLEX_TOKEN)
+        results, timings = run_audit(plex, rules, section_titles)
+        print_results(rules, results, timings)
+        return results
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,28 @@
 from plexapi.server import PlexServer
+from urllib.parse import urlencode
 
 
 plex_url = 'http://localhost:32400'
 plex_token = 'your_plex_token'
+page_size = 500  # Number of movies requested from Plex at a time
+
+def iter_movies(plex, section, page_size=page_size):
+    """Yield a slim record for every movie in the section, one page at a time"""
+    start = 0
+    while True:
+        params = {'X-Plex-Container-Start': start, 'X-Plex-Container-Size': page_size}
+        data = plex.query(f'/library/sections/{section.key}/all?{urlencode(params)}')
+        page = [elem for elem in data if elem.tag == 'Video']
+        for elem in page:
+            yield {
+                'rating_key': elem.attrib.get('ratingKey'),
+                'title': elem.attrib.get('title'),
+                'year': elem.attrib.get('year'),
+                'genres': [genre.attrib.get('tag') for genre in elem.findall('Genre')]
+            }
+        start += len(page)
+        if not page or start >= int(data.attrib.get('totalSize', start)):
+            break
 
 def find_movies_without_genre():
     try:
@@ -11,11 +31,11 @@ def find_movies_without_genre():
         movies = plex.library.section('Movies')
         
         movies_without_genre = []
-        for movie in movies.all():
-            if not movie.genres:
+        for movie in iter_movies(plex, movies):
+            if not movie['genres']:
                 movies_without_genre.append({
-                    'title': movie.title,
-                    'year': movie.year
+                    'title': movie['title'],
+                    'year': movie['year']
                 })
         
         if movies_without_genre: